@@ -1,10 +1,21 @@
-from flask import Flask, render_template, jsonify, Response, request
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, render_template, jsonify, Response, request, g
 import json
 import logging
+import math
+import os
 from utils.gpu_monitor import GPUMonitor
 from utils.ollama_client import OllamaClient
-from utils.benchmark import ModelBenchmark
-import time
+from utils.benchmark import ModelBenchmark, MAX_REPEATS
+from utils.benchmark_history import BenchmarkHistory
+from utils.storage_analyzer import StorageAnalyzer
+from utils.vram_planner import VRAMPlanner
+from utils.bulk_operations import BulkOperations
+from utils.canary import CanaryProber, MIN_INTERVAL as MIN_CANARY_INTERVAL
+from utils.compression import compress_response
+from utils.sse import StatsBroadcaster, stream_stats
 import traceback
 from urllib.parse import urlparse
 
@@ -17,13 +28,74 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 gpu_monitor = GPUMonitor()
+gpu_broadcaster = StatsBroadcaster(gpu_monitor.get_stats)
 ollama_client = OllamaClient()
-model_benchmark = ModelBenchmark(ollama_client)
+# Probe the Ollama server in the background so startup never waits on it
+ollama_client.start_background_check()
+benchmark_history = BenchmarkHistory()
+model_benchmark = ModelBenchmark(ollama_client, gpu_monitor=gpu_monitor, history=benchmark_history)
+storage_analyzer = StorageAnalyzer()
+vram_planner = VRAMPlanner(ollama_client, gpu_monitor)
+bulk_operations = BulkOperations(ollama_client)
+canary_prober = CanaryProber(ollama_client, gpu_monitor=gpu_monitor,
+                             model_benchmark=model_benchmark, history=benchmark_history)
+
+def _canary_interval_from_env():
+    """Canary probes are opt-in: OLLAMA_MANAGER_CANARY_INTERVAL=<seconds>"""
+    value = os.environ.get('OLLAMA_MANAGER_CANARY_INTERVAL')
+    if not value:
+        return None
+    try:
+        interval = float(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid OLLAMA_MANAGER_CANARY_INTERVAL: {value!r}")
+        return None
+    if not math.isfinite(interval) or interval <= 0:
+        return None
+    if interval < MIN_CANARY_INTERVAL:
+        logger.warning(f"OLLAMA_MANAGER_CANARY_INTERVAL raised to the {MIN_CANARY_INTERVAL}s minimum")
+        interval = MIN_CANARY_INTERVAL
+    return interval
+
+
+_canary_interval = _canary_interval_from_env()
+if _canary_interval:
+    canary_prober.start(interval=_canary_interval)
+
+startup_metrics = {
+    "import_ms": (time.perf_counter() - _import_started) * 1000,
+    "first_request_ms": None
+}
+
+@app.before_request
+def _track_first_request_start():
+    if startup_metrics["first_request_ms"] is None:
+        g.started_at = time.perf_counter()
+
+@app.after_request
+def _track_first_request_end(response):
+    started_at = g.get('started_at')
+    if started_at is not None and startup_metrics["first_request_ms"] is None:
+        startup_metrics["first_request_ms"] = (time.perf_counter() - started_at) * 1000
+        logger.info(f"Startup: import {startup_metrics['import_ms']:.1f}ms, "
+                    f"first request {startup_metrics['first_request_ms']:.1f}ms")
+    return response
+
+@app.after_request
+def _compress_json(response):
+    return compress_response(response, request.headers.get('Accept-Encoding'))
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/api/status')
+def get_status():
+    return jsonify({
+        "connection": ollama_client.get_connection_status(),
+        "startup": startup_metrics
+    })
+
 @app.route('/api/settings/server', methods=['POST'])
 def update_server_settings():
     try:
@@ -59,7 +131,7 @@ def update_server_settings():
             
         # Update the client's base URL
         ollama_client.base_url = url
-        status = ollama_client.check_connection()
+        status = ollama_client.refresh_connection_status()
         
         return jsonify(status)
         
@@ -87,11 +159,8 @@ def check_server_settings():
                 }
             }), 400
             
-        # Temporarily set URL to check connection
-        original_url = ollama_client.base_url
-        ollama_client.base_url = url
-        status = ollama_client.check_connection()
-        ollama_client.base_url = original_url
+        # Throwaway client: the shared one may be probing in the background
+        status = OllamaClient(base_url=url).check_connection()
         
         return jsonify(status)
         
@@ -124,6 +193,9 @@ def get_models():
             return jsonify({"error": result["error"]})
 
         models = result.get('models', [])
+        if result.get('status') == 'checking':
+            return jsonify({"status": "checking", "models": models})
+
         logger.info(f"Successfully listed {len(models)} models")
         return jsonify({"models": models})
 
@@ -158,6 +230,9 @@ def get_running_models():
             return jsonify({"error": result["error"]})
 
         models = result.get('models', [])
+        if result.get('status') == 'checking':
+            return jsonify({"status": "checking", "models": models})
+
         logger.info(f"Successfully retrieved {len(models)} running models")
         return jsonify({"models": models})
 
@@ -172,6 +247,86 @@ def get_running_models():
             }
         })
 
+@app.route('/api/models/metadata')
+def get_models_metadata():
+    try:
+        result = ollama_client.get_models_metadata()
+        if "error" in result:
+            logger.error(f"Error listing model metadata: {result['error']}")
+            return jsonify({"error": result["error"]})
+
+        models = result.get('models', [])
+        logger.info(f"Successfully listed metadata for {len(models)} models")
+        return jsonify({"models": models})
+
+    except Exception as e:
+        logger.error(f"Failed to get model metadata: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({
+            "error": {
+                "message": "Impossible de récupérer les métadonnées des modèles",
+                "code": "METADATA_FETCH_ERROR",
+                "details": str(e)
+            }
+        })
+
+@app.route('/api/models/storage')
+def get_models_storage():
+    try:
+        result = storage_analyzer.analyze()
+        if "error" in result:
+            logger.error(f"Error analyzing model storage: {result['error']}")
+            return jsonify({"error": result["error"]})
+
+        logger.info(f"Analyzed storage of {result['summary']['tag_count']} models")
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Failed to analyze model storage: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({
+            "error": {
+                "message": "Impossible d'analyser le stockage des modèles",
+                "code": "STORAGE_ANALYSIS_ERROR",
+                "details": str(e)
+            }
+        })
+
+@app.route('/api/models/plan/<model_name>')
+def plan_model(model_name):
+    try:
+        try:
+            num_ctx = int(request.args.get('num_ctx', 2048))
+            num_parallel = int(request.args.get('num_parallel', 1))
+            if num_ctx <= 0 or num_parallel <= 0:
+                raise ValueError("values must be positive")
+        except ValueError as e:
+            return jsonify({
+                "error": {
+                    "message": "Paramètres de planification invalides",
+                    "code": "INVALID_PLAN_PARAMS",
+                    "details": str(e)
+                }
+            }), 400
+
+        result = vram_planner.plan(model_name, num_ctx=num_ctx, num_parallel=num_parallel)
+        if "error" in result:
+            logger.error(f"Error planning model {model_name}: {result['error']}")
+            return jsonify({"error": result["error"]})
+
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Failed to plan model {model_name}: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({
+            "error": {
+                "message": f"Impossible d'estimer la mémoire pour {model_name}",
+                "code": "PLAN_ERROR",
+                "details": str(e)
+            }
+        })
+
 @app.route('/api/models/stop/<model_name>', methods=['POST'])
 def stop_model(model_name):
     try:
@@ -212,6 +367,63 @@ def stop_model(model_name):
             }
         })
 
+@app.route('/api/models/bulk/<operation>', methods=['POST'])
+def bulk_model_operation(operation):
+    try:
+        data = request.get_json(silent=True) or {}
+        models = data.get('models')
+        servers = data.get('servers') or None
+        keep_alive = data.get('keep_alive')
+
+        if servers is not None:
+            for server in servers:
+                parsed = urlparse(server) if isinstance(server, str) else None
+                if not parsed or not all([parsed.scheme, parsed.netloc]):
+                    return jsonify({
+                        "error": {
+                            "message": "Format d'URL invalide",
+                            "code": "INVALID_URL",
+                            "details": f"{server}: l'URL doit être au format http(s)://host:port"
+                        }
+                    }), 400
+
+        try:
+            parallel = int(data['parallel']) if data.get('parallel') is not None else None
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                "error": {
+                    "message": "Parallélisme invalide",
+                    "code": "INVALID_PARALLEL",
+                    "details": str(e)
+                }
+            }), 400
+
+        error = bulk_operations.validate(operation, models)
+        if error:
+            return jsonify(error), 400
+
+        logger.info(f"Bulk {operation} of {len(models)} models on {len(servers or [ollama_client.base_url])} servers")
+
+        if data.get('stream'):
+            def generate():
+                for result in bulk_operations.iter_results(operation, models, servers, parallel, keep_alive):
+                    yield json.dumps(result) + "\n"
+
+            return Response(generate(), mimetype='application/x-ndjson')
+
+        return jsonify(bulk_operations.run(operation, models, servers, parallel, keep_alive))
+
+    except Exception as e:
+        logger.error(f"Failed bulk {operation}: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({
+            "error": {
+                "message": f"Impossible d'exécuter l'opération groupée {operation}",
+                "code": "BULK_OPERATION_ERROR",
+                "details": str(e)
+            }
+        })
+
 @app.route('/api/models/benchmark/<model_name>', methods=['POST'])
 def benchmark_model(model_name):
     try:
@@ -223,8 +435,22 @@ def benchmark_model(model_name):
                 }
             }), 400
 
+        data = request.get_json(silent=True) or {}
+        sample_interval = data.get('sample_interval')
+        if sample_interval is not None:
+            try:
+                sample_interval = float(sample_interval)
+            except (TypeError, ValueError):
+                return jsonify({
+                    "error": {
+                        "message": "Intervalle d'échantillonnage invalide",
+                        "code": "INVALID_SAMPLE_INTERVAL",
+                        "details": "L'intervalle doit être un nombre de secondes (minimum 0.05)"
+                    }
+                }), 400
+
         logger.info(f"Starting benchmark for model: {model_name}")
-        result = model_benchmark.start_benchmark(model_name)
+        result = model_benchmark.start_benchmark(model_name, sample_interval=sample_interval)
         
         if not isinstance(result, dict):
             return jsonify({
@@ -235,7 +461,7 @@ def benchmark_model(model_name):
                 }
             })
 
-        if "error" in result:
+        if result.get("error"):
             logger.error(f"Error benchmarking model {model_name}: {result['error']}")
             return jsonify({"error": result["error"]})
 
@@ -255,6 +481,94 @@ def benchmark_model(model_name):
             }
         })
 
+@app.route('/api/models/benchmark/<model_name>/suite', methods=['POST'])
+def benchmark_model_suite(model_name):
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            repeats = int(data.get('repeats', 5))
+            if not 1 <= repeats <= MAX_REPEATS:
+                raise ValueError(f"repeats must be between 1 and {MAX_REPEATS}")
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                "error": {
+                    "message": "Nombre de répétitions invalide",
+                    "code": "INVALID_REPEATS",
+                    "details": str(e)
+                }
+            }), 400
+
+        logger.info(f"Starting benchmark suite for model: {model_name} ({repeats} runs)")
+        result = model_benchmark.run_suite(model_name, repeats=repeats)
+
+        if "error" in result:
+            logger.error(f"Error benchmarking model {model_name}: {result['error']}")
+            return jsonify({"error": result["error"]})
+
+        return jsonify({
+            "status": "success",
+            "result": result
+        })
+
+    except Exception as e:
+        logger.error(f"Failed to run benchmark suite for {model_name}: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({
+            "error": {
+                "message": f"Impossible de lancer la série de benchmarks pour {model_name}",
+                "code": "BENCHMARK_SUITE_ERROR",
+                "details": str(e)
+            }
+        })
+
+@app.route('/api/benchmarks/regressions')
+def get_benchmark_regressions():
+    try:
+        return jsonify(benchmark_history.report())
+
+    except Exception as e:
+        logger.error(f"Failed to build regression report: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({
+            "error": {
+                "message": "Impossible de générer le rapport de régressions",
+                "code": "REGRESSION_REPORT_ERROR",
+                "details": str(e)
+            }
+        })
+
+@app.route('/api/benchmarks/baseline', methods=['POST'])
+def set_benchmark_baseline():
+    try:
+        data = request.get_json(silent=True) or {}
+        key = data.get('key')
+        # Optional: pin the latest runs of this version rather than the latest runs
+        version = data.get('version')
+        if not key:
+            return jsonify({
+                "error": {
+                    "message": "Configuration manquante",
+                    "code": "MISSING_BASELINE"
+                }
+            }), 400
+
+        result = benchmark_history.set_baseline(key, version)
+        if "error" in result:
+            return jsonify({"error": result["error"]}), 404
+
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Failed to set benchmark baseline: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({
+            "error": {
+                "message": "Impossible de définir la référence",
+                "code": "BASELINE_ERROR",
+                "details": str(e)
+            }
+        })
+
 @app.route('/api/models/benchmark/results')
 def get_benchmark_results():
     try:
@@ -284,26 +598,97 @@ def get_benchmark_results():
             }
         })
 
+@app.route('/api/canary')
+def get_canary_status():
+    try:
+        return jsonify(canary_prober.get_status())
+
+    except Exception as e:
+        logger.error(f"Failed to get canary status: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({
+            "error": {
+                "message": "Impossible de récupérer l'état des sondes",
+                "code": "CANARY_STATUS_ERROR",
+                "details": str(e)
+            }
+        })
+
+@app.route('/api/canary/history/<model_name>')
+def get_canary_history(model_name):
+    return jsonify({"model": model_name, "results": canary_prober.get_history(model_name)})
+
+@app.route('/api/canary/start', methods=['POST'])
+def start_canary():
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            interval = float(data['interval']) if data.get('interval') is not None else None
+            if interval is not None and not (math.isfinite(interval) and interval >= MIN_CANARY_INTERVAL):
+                raise ValueError(f"interval must be at least {MIN_CANARY_INTERVAL} seconds")
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                "error": {
+                    "message": "Intervalle de sonde invalide",
+                    "code": "INVALID_CANARY_INTERVAL",
+                    "details": str(e)
+                }
+            }), 400
+
+        if not canary_prober.start(interval=interval):
+            return jsonify({
+                "error": {
+                    "message": "Les sondes précédentes sont encore en cours d'arrêt",
+                    "code": "CANARY_STOPPING",
+                    "details": "Réessayez une fois la sonde en cours terminée"
+                }
+            }), 409
+        return jsonify(canary_prober.get_status())
+
+    except Exception as e:
+        logger.error(f"Failed to start canary probes: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({
+            "error": {
+                "message": "Impossible de démarrer les sondes",
+                "code": "CANARY_START_ERROR",
+                "details": str(e)
+            }
+        })
+
+@app.route('/api/canary/stop', methods=['POST'])
+def stop_canary():
+    canary_prober.stop()
+    return jsonify(canary_prober.get_status())
+
 @app.route('/api/gpu/stats')
 def gpu_stats_stream():
-    def generate():
-        while True:
-            try:
-                stats = gpu_monitor.get_stats()
-                data = json.dumps(stats)
-                yield f"data: {data}\n\n"
-                time.sleep(1)
-            except Exception as e:
-                logger.error(f"Error generating GPU stats: {str(e)}")
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                error_response = {
-                    "error": {
-                        "message": "Erreur lors de la génération des statistiques GPU",
-                        "code": "GPU_STATS_ERROR",
-                        "details": str(e)
-                    }
-                }
-                yield f"data: {json.dumps(error_response)}\n\n"
-                time.sleep(1)
+    mode = request.args.get('mode', 'delta')
+    if mode not in ('delta', 'full'):
+        return jsonify({
+            "error": {
+                "message": "Mode de flux invalide",
+                "code": "INVALID_STREAM_MODE",
+                "details": "Modes disponibles: delta, full"
+            }
+        }), 400
+    try:
+        interval = float(request.args['interval']) if 'interval' in request.args else None
+        # nan/inf would leave the client with heartbeats only
+        if interval is not None and not (math.isfinite(interval) and interval > 0):
+            raise ValueError("interval must be a positive number of seconds")
+    except ValueError as e:
+        return jsonify({
+            "error": {
+                "message": "Intervalle invalide",
+                "code": "INVALID_INTERVAL",
+                "details": str(e)
+            }
+        }), 400
 
-    return Response(generate(), mimetype='text/event-stream')
+    response = Response(stream_stats(gpu_broadcaster, mode=mode, interval=interval),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Disable proxy buffering (nginx) so frames are delivered immediately
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,162 @@
+"""Headless benchmark runner.
+
+Runs ModelBenchmark suites against one or more Ollama servers without the
+web application, streams progress to stderr and writes JSON results.
+
+Exit codes: 0 success, 1 regression detected, 2 benchmark errors.
+
+Example:
+    python benchmark_cli.py -s http://node1:11434 -s http://node2:11434 \\
+        -m llama3:8b -n 5 -o results.json
+"""
+import argparse
+import json
+import logging
+import socket
+import sys
+from datetime import datetime
+from urllib.parse import urlparse
+
+from utils.benchmark import ModelBenchmark, DEFAULT_PROMPT, MAX_REPEATS
+from utils.benchmark_history import BenchmarkHistory, DEFAULT_TOLERANCE
+from utils.gpu_monitor import GPUMonitor
+from utils.ollama_client import OllamaClient
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_ERROR = 2
+
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1', '0.0.0.0')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Ollama models from the command line")
+    parser.add_argument('-s', '--server', action='append', dest='servers',
+                        help="Ollama server URL (repeatable, default: OLLAMA_SERVER_URL or http://localhost:11434)")
+    parser.add_argument('-m', '--model', action='append', dest='models', required=True,
+                        help="Model to benchmark (repeatable)")
+    parser.add_argument('-n', '--repeats', type=int, default=5,
+                        help=f"Runs per model, after a discarded warm-up run (default: 5, max: {MAX_REPEATS})")
+    parser.add_argument('-p', '--prompt', default=DEFAULT_PROMPT, help="Prompt used for every run")
+    parser.add_argument('--sample-interval', type=float, default=0.1,
+                        help="System metrics sampling interval in seconds (default: 0.1)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative change tolerated before flagging a regression (default: 0.05)")
+    parser.add_argument('--history', help="Benchmark history file (default: OLLAMA_MANAGER_BENCHMARK_HISTORY)")
+    gpu = parser.add_mutually_exclusive_group()
+    gpu.add_argument('--gpu', action='store_true',
+                     help="Sample local GPU metrics even for remote servers (e.g. through a tunnel)")
+    gpu.add_argument('--no-gpu', action='store_true', help="Do not sample GPU metrics")
+    parser.add_argument('-o', '--output', default='-', help="JSON results file, '-' for stdout (default)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Show library logs")
+    args = parser.parse_args(argv)
+    if not 1 <= args.repeats <= MAX_REPEATS:
+        parser.error(f"--repeats must be between 1 and {MAX_REPEATS}")
+    return args
+
+
+def progress(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def format_run(server, model, index, repeats, result):
+    if not result.get('success'):
+        return f"[{server}] {model} run {index}/{repeats}: échec ({result.get('error')})"
+    tps = result.get('tokens_per_second')
+    ttft = result.get('ttft')
+    tps_text = f"{tps:.1f} tok/s" if tps is not None else "? tok/s"
+    ttft_text = f"TTFT {ttft:.3f}s" if ttft is not None else "TTFT ?"
+    return f"[{server}] {model} run {index}/{repeats}: {tps_text}, {ttft_text}, {result['elapsed_time']:.2f}s"
+
+
+def is_local(url):
+    """Whether the server runs on this machine, so local GPU metrics describe it"""
+    host = urlparse(url).hostname or ''
+    return host in LOCAL_HOSTS or host == socket.gethostname()
+
+
+def run_server(server, args, history, gpu_monitor):
+    client = OllamaClient(base_url=server)
+    server = client.base_url
+    if gpu_monitor is not None and not args.gpu and not is_local(server):
+        # nvidia-smi only sees this machine's GPUs
+        progress(f"[{server}] serveur distant, métriques GPU désactivées (--gpu pour forcer)")
+        gpu_monitor = None
+    status = client.get_connection_status()
+    entry = {"server": server, "status": status.get("status"), "models": []}
+    if status.get("status") != "connected":
+        progress(f"[{server}] serveur indisponible")
+        entry["error"] = status.get("error")
+        return entry, True
+
+    entry["version"] = client.get_server_version()
+    progress(f"[{server}] connecté (version {entry['version']})")
+    benchmark = ModelBenchmark(client, gpu_monitor=gpu_monitor,
+                               sample_interval=args.sample_interval, history=history)
+
+    failed = False
+    for model in args.models:
+        progress(f"[{server}] {model}: {args.repeats} runs")
+        suite = benchmark.run_suite(
+            model,
+            repeats=args.repeats,
+            prompt=args.prompt,
+            on_run=lambda index, repeats, result: progress(format_run(server, model, index, repeats, result))
+        )
+        if "error" in suite:
+            progress(f"[{server}] {model}: {suite['error']}")
+            entry["models"].append({"model": model, "error": suite["error"]})
+            failed = True
+            continue
+        if suite["succeeded"] < suite["repeats"]:
+            failed = True
+        comparison = suite.get("comparison")
+        if comparison:
+            progress(f"[{server}] {model}: {comparison['status']} "
+                     f"(référence {comparison['baseline_version']}, version {comparison['candidate_version']})")
+        entry["models"].append(suite)
+    return entry, failed
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.verbose:
+        # ollama_client configures the root logger at import time
+        logging.getLogger().setLevel(logging.WARNING)
+
+    servers = args.servers or [None]
+    history = BenchmarkHistory(path=args.history, tolerance=args.tolerance)
+    gpu_monitor = None if args.no_gpu else GPUMonitor()
+
+    report = {"started_at": datetime.now().isoformat(), "servers": [], "regressions": []}
+    failed = False
+    for server in servers:
+        entry, server_failed = run_server(server, args, history, gpu_monitor)
+        report["servers"].append(entry)
+        failed = failed or server_failed
+        for suite in entry["models"]:
+            comparison = suite.get("comparison")
+            if comparison and comparison["status"] == "regression":
+                report["regressions"].append(comparison)
+    report["finished_at"] = datetime.now().isoformat()
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        progress(f"Résultats écrits dans {args.output}")
+
+    if report["regressions"]:
+        progress(f"{len(report['regressions'])} régression(s) détectée(s)")
+        return EXIT_REGRESSION
+    if failed:
+        return EXIT_ERROR
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
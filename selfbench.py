@@ -0,0 +1,229 @@
+"""Self-benchmark of the manager's own hot paths against a fake Ollama server.
+
+Starts utils.fake_ollama.FakeOllamaServer and the Flask app in-process, then
+drives the JSON routes, the /api/gpu/stats SSE fan-out and benchmark
+submission with many simulated dashboards. Reports per-route latency
+percentiles and memory growth, so no real models are needed.
+
+Example:
+    python selfbench.py --dashboards 50 --requests 500 -o selfbench.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+import requests
+
+from utils.fake_ollama import FakeOllamaServer
+
+JSON_ROUTES = ['/api/models', '/api/models/running']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the manager against a fake Ollama server")
+    parser.add_argument('--dashboards', type=int, default=20, help="Concurrent simulated dashboards (default: 20)")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per JSON route (default: 200)")
+    parser.add_argument('--sse-events', type=int, default=3, help="Events read per SSE client (default: 3)")
+    parser.add_argument('--sse-mode', choices=['full', 'delta'], default='full',
+                        help="SSE stream mode; delta only emits on change (default: full)")
+    parser.add_argument('--benchmarks', type=int, default=2, help="Benchmark submissions per model (default: 2)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Fake server latency per request in seconds")
+    parser.add_argument('--token-rate', type=float, default=200.0, help="Fake generation rate in tokens/sec")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of fake requests that fail")
+    parser.add_argument('-o', '--output', default='-', help="JSON report file, '-' for stdout (default)")
+    return parser.parse_args(argv)
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def rank(p):
+        return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+    return {
+        "count": len(values),
+        "p50_ms": rank(50) * 1000,
+        "p90_ms": rank(90) * 1000,
+        "p99_ms": rank(99) * 1000,
+        "max_ms": values[-1] * 1000
+    }
+
+
+class MemoryProbe:
+    """Python heap (tracemalloc) and process RSS growth over a scenario"""
+
+    def __init__(self):
+        self.process = psutil.Process()
+
+    def __enter__(self):
+        self.heap_start = tracemalloc.get_traced_memory()[0]
+        self.rss_start = self.process.memory_info().rss
+        return self
+
+    def __exit__(self, *exc_info):
+        self.heap_growth = tracemalloc.get_traced_memory()[0] - self.heap_start
+        self.rss_growth = self.process.memory_info().rss - self.rss_start
+
+    def report(self):
+        return {"heap_growth_bytes": self.heap_growth, "rss_growth_bytes": self.rss_growth}
+
+
+def timed_get(session, url):
+    start = time.perf_counter()
+    try:
+        response = session.get(url, timeout=30)
+        ok = response.status_code == 200 and "error" not in response.json()
+    except (requests.exceptions.RequestException, ValueError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def bench_json_route(base_url, route, total, dashboards):
+    sessions = threading.local()
+
+    def call(_):
+        if not hasattr(sessions, 'session'):
+            sessions.session = requests.Session()
+        return timed_get(sessions.session, f"{base_url}{route}")
+
+    with MemoryProbe() as memory, ThreadPoolExecutor(max_workers=dashboards) as executor:
+        results = list(executor.map(call, range(total)))
+    return {
+        **percentiles([elapsed for elapsed, _ok in results]),
+        "errors": sum(1 for _elapsed, ok in results if not ok),
+        **memory.report()
+    }
+
+
+def bench_sse(base_url, dashboards, events, mode='full'):
+    def dashboard(_):
+        start = time.perf_counter()
+        first = None
+        gaps = []
+        last = start
+        received = 0
+        try:
+            with requests.get(f"{base_url}/api/gpu/stats", params={"mode": mode},
+                              stream=True, timeout=30) as response:
+                for line in response.iter_lines(chunk_size=None):
+                    if not line or not line.startswith(b"data:"):
+                        continue
+                    now = time.perf_counter()
+                    if first is None:
+                        first = now - start
+                    else:
+                        gaps.append(now - last)
+                    last = now
+                    received += 1
+                    if received >= events:
+                        break
+        except requests.exceptions.RequestException:
+            pass
+        return first, gaps, received
+
+    with MemoryProbe() as memory, ThreadPoolExecutor(max_workers=dashboards) as executor:
+        results = list(executor.map(dashboard, range(dashboards)))
+    return {
+        "clients": dashboards,
+        "first_event": percentiles([first for first, _gaps, _n in results if first is not None]),
+        "event_interval": percentiles([gap for _first, gaps, _n in results for gap in gaps]),
+        "incomplete_clients": sum(1 for _first, _gaps, n in results if n < events),
+        **memory.report()
+    }
+
+
+def bench_benchmark_submission(base_url, models, repeats):
+    def submit(model):
+        start = time.perf_counter()
+        try:
+            response = requests.post(f"{base_url}/api/models/benchmark/{model}", json={}, timeout=120)
+            ok = response.status_code == 200 and "error" not in response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            ok = False
+        return time.perf_counter() - start, ok
+
+    results = []
+    with MemoryProbe() as memory, ThreadPoolExecutor(max_workers=len(models)) as executor:
+        for _ in range(repeats):
+            results.extend(executor.map(submit, models))
+    return {
+        **percentiles([elapsed for elapsed, _ok in results]),
+        "errors": sum(1 for _elapsed, ok in results if not ok),
+        **memory.report()
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    fake = FakeOllamaServer(latency=args.latency, token_rate=args.token_rate,
+                            failure_rate=args.failure_rate, running=['llama3:8b']).start()
+    state_dir = tempfile.mkdtemp(prefix='ollama-manager-selfbench-')
+    os.environ['OLLAMA_SERVER_URL'] = fake.url
+    os.environ['OLLAMA_MANAGER_METADATA_CACHE'] = os.path.join(state_dir, 'model_metadata.json')
+    os.environ['OLLAMA_MANAGER_VRAM_CALIBRATION'] = os.path.join(state_dir, 'vram_calibration.json')
+    os.environ['OLLAMA_MANAGER_BENCHMARK_HISTORY'] = os.path.join(state_dir, 'benchmark_history.json')
+
+    tracemalloc.start()
+    import_start = time.perf_counter()
+    from werkzeug.serving import make_server
+    from app import app
+    import_time = time.perf_counter() - import_start
+    # The app configures INFO logging at import; keep the benchmark output readable
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    report = {
+        "config": vars(args),
+        "app_import_ms": import_time * 1000,
+        "routes": {}
+    }
+    try:
+        for route in JSON_ROUTES:
+            print(f"{route}: {args.requests} requêtes, {args.dashboards} tableaux de bord", file=sys.stderr)
+            report["routes"][route] = bench_json_route(base_url, route, args.requests, args.dashboards)
+        print(f"/api/gpu/stats: {args.dashboards} clients SSE", file=sys.stderr)
+        report["routes"]["/api/gpu/stats"] = bench_sse(base_url, args.dashboards, args.sse_events, args.sse_mode)
+        print("/api/models/benchmark: soumissions concurrentes", file=sys.stderr)
+        report["routes"]["/api/models/benchmark"] = bench_benchmark_submission(
+            base_url, list(fake.models), args.benchmarks
+        )
+    finally:
+        server.shutdown()
+        fake.stop()
+        report["fake_server_requests"] = fake.requests
+        report["peak_heap_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    for route, stats in report["routes"].items():
+        latency = stats.get("first_event", stats)
+        if latency.get("count"):
+            print(f"{route}: p50 {latency['p50_ms']:.1f}ms, p99 {latency['p99_ms']:.1f}ms, "
+                  f"heap +{stats['heap_growth_bytes'] / 1024:.0f} KiB", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
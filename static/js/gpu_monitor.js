@@ -5,6 +5,8 @@ class GPUMonitor {
         this.retryCount = 0;
         this.eventSource = null;
         this.isConnecting = false;
+        // Last full stats, updated by keyframe and delta events
+        this.stats = null;
         this.connectSSE();
     }
 
@@ -16,6 +18,7 @@ class GPUMonitor {
             if (this.eventSource) {
                 this.eventSource.close();
             }
+            this.stats = null;
 
             this.eventSource = new EventSource('/api/gpu/stats');
             this.setupEventListeners();
@@ -30,10 +33,18 @@ class GPUMonitor {
     setupEventListeners() {
         if (!this.eventSource) return;
 
-        this.eventSource.onmessage = (event) => {
+        const handleFrame = (event, merge) => {
             try {
-                const stats = JSON.parse(event.data);
-                this.updateStats(stats);
+                const data = JSON.parse(event.data);
+                if (merge && this.stats) {
+                    Object.assign(this.stats, data);
+                } else if (!merge) {
+                    this.stats = data;
+                } else {
+                    // Delta without a keyframe yet, wait for the next one
+                    return;
+                }
+                this.updateStats(this.stats);
                 // Reset retry count on successful connection
                 this.retryCount = 0;
             } catch (error) {
@@ -42,6 +53,11 @@ class GPUMonitor {
             }
         };
 
+        // Full frames (legacy format) and keyframes replace the state, deltas patch it
+        this.eventSource.onmessage = (event) => handleFrame(event, false);
+        this.eventSource.addEventListener('keyframe', (event) => handleFrame(event, false));
+        this.eventSource.addEventListener('delta', (event) => handleFrame(event, true));
+
         this.eventSource.onerror = (error) => {
             console.error('SSE Error:', error);
             this.handleConnectionError(error);
@@ -188,6 +188,10 @@ class ModelManager {
             );
             
             this.updateModelsList(data.models || []);
+            // Server probe still pending at startup, poll again shortly
+            if (data.status === 'checking') {
+                setTimeout(() => this.refreshModelsList(), 1000);
+            }
         } catch (error) {
             console.error('Failed to fetch models:', error);
             // Don't clear the list for certain errors
@@ -1,29 +1,55 @@
 import time
 import json
-import psutil
-import threading
+import uuid
+import requests
 from datetime import datetime
 import logging
+from utils.metrics_sampler import MetricsSampler
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PROMPT = "Tell me a short story about a robot."
+MAX_REPEATS = 50  # runs per suite
+
 class ModelBenchmark:
-    def __init__(self, ollama_client):
+    def __init__(self, ollama_client, gpu_monitor=None, sample_interval=0.1, history=None):
         self.ollama_client = ollama_client
+        self.gpu_monitor = gpu_monitor
+        self.history = history
+        self.sample_interval = sample_interval
         self.active_benchmarks = {}
         self.benchmark_results = {}
-        
-    def _measure_system_metrics(self):
-        """Measure system metrics during benchmark"""
-        metrics = {
-            'cpu_percent': psutil.cpu_percent(interval=1),
-            'memory_percent': psutil.virtual_memory().percent,
-            'timestamp': datetime.now().isoformat()
-        }
-        logger.info(f"System metrics: {metrics}")
-        return metrics
+
+    def _stream_generate(self, model_name, prompt, sampler):
+        """Stream a generation, recording token arrival times on the sampler timeline"""
+        token_times = []
+        final = {}
+        with requests.post(
+            f"{self.ollama_client.base_url}/api/generate",
+            json={"model": model_name, "prompt": prompt, "stream": True},
+            stream=True,
+            # No bytes arrive while Ollama loads the model, so only bound the connect
+            timeout=(self.ollama_client.timeout, None)
+        ) as response:
+            if response.status_code != 200:
+                return token_times, {"error": response.text or f"HTTP {response.status_code}"}
+
+            for line in response.iter_lines(chunk_size=None):
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    return token_times, {"error": chunk["error"]}
+                if chunk.get("response"):
+                    if not token_times:
+                        sampler.mark('generation')
+                    token_times.append(sampler.elapsed())
+                if chunk.get("done"):
+                    final = chunk
+                    break
+        return token_times, final
     
-    def start_benchmark(self, model_name, prompt="Tell me a short story about a robot."):
+    def start_benchmark(self, model_name, prompt=DEFAULT_PROMPT, sample_interval=None, record=True, suite=None):
         """Start a benchmark for a specific model"""
         if model_name in self.active_benchmarks:
             logger.warning(f"Benchmark already running for model {model_name}")
@@ -50,45 +76,70 @@ class ModelBenchmark:
             self.active_benchmarks[model_name] = benchmark_data
             logger.info(f"Started benchmark for model {model_name}")
             
-            # Start monitoring thread
-            def monitor_metrics():
-                while model_name in self.active_benchmarks:
-                    if self.active_benchmarks[model_name]['status'] != 'running':
-                        break
-                    metrics = self._measure_system_metrics()
-                    self.active_benchmarks[model_name]['metrics'].append(metrics)
-                    time.sleep(1)
-            
-            monitor_thread = threading.Thread(target=monitor_metrics)
-            monitor_thread.daemon = True
-            monitor_thread.start()
-            
-            # Make the actual API call with timeout
-            response = self.ollama_client._make_request(
-                "POST",
-                "/api/generate",
-                json={"model": model_name, "prompt": prompt},
+            # Sample system metrics in the background on the same monotonic
+            # timeline as the token stream
+            sampler = MetricsSampler(
+                interval=sample_interval or self.sample_interval,
+                gpu_monitor=self.gpu_monitor
             )
+            benchmark_data['metrics'] = sampler.samples
+            sampler.start(phase='prompt_eval')
+            
+            try:
+                token_times, response = self._stream_generate(model_name, prompt, sampler)
+            finally:
+                samples = sampler.stop()
             
             end_time = time.time()
             elapsed_time = end_time - benchmark_data['start_time']
             
+            # Model load time is reported separately and excluded from TTFT,
+            # so cold and warm runs stay comparable
+            load_duration = response.get('load_duration', 0) / 1e9
+            first_token_time = token_times[0] if token_times else None
+            ttft = max(first_token_time - load_duration, 0) if first_token_time is not None else None
+            gpu_samples = list(sampler.gpu_samples)
+            if load_duration:
+                for sample in samples + gpu_samples:
+                    if sample['t'] < load_duration:
+                        sample['phase'] = 'load'
+                sampler.marks.insert(1, {'t': load_duration, 'phase': 'prompt_eval'})
+                sampler.marks[0]['phase'] = 'load'
+            tokens_per_second = None
+            if response.get('eval_count') and response.get('eval_duration'):
+                tokens_per_second = response['eval_count'] / (response['eval_duration'] / 1e9)
+            elif len(token_times) > 1 and token_times[-1] > token_times[0]:
+                tokens_per_second = (len(token_times) - 1) / (token_times[-1] - token_times[0])
+            
             # Process results
             result = {
                 'model': model_name,
                 'elapsed_time': elapsed_time,
-                'metrics': benchmark_data['metrics'],
+                'ttft': ttft,
+                'load_duration': load_duration,
+                'first_token_time': first_token_time,
+                'tokens_per_second': tokens_per_second,
+                'token_count': len(token_times),
+                'token_times': token_times,
+                'sample_interval': sampler.interval,
+                'metrics': samples,
+                'gpu_metrics': gpu_samples,
+                'phases': sampler.marks,
+                'phase_metrics': MetricsSampler.summarize(samples, gpu_samples),
                 'success': 'error' not in response,
                 'error': response.get('error'),
                 'timestamp': datetime.now().isoformat()
             }
             
-            logger.info(f"Benchmark completed for {model_name}: {result}")
+            logger.info(f"Benchmark completed for {model_name}: {elapsed_time:.2f}s, {len(samples)} samples")
             
             # Store results and cleanup
             self.benchmark_results[model_name] = result
             del self.active_benchmarks[model_name]
             
+            if result['success'] and record:
+                self._record_history(model_name, prompt, result, suite)
+            
             return result
             
         except Exception as e:
@@ -97,6 +148,73 @@ class ModelBenchmark:
                 del self.active_benchmarks[model_name]
             return {"error": f"Erreur lors du benchmark: {str(e)}"}
     
+    def _record_history(self, model_name, prompt, result, suite=None):
+        """Record a successful run for regression tracking"""
+        if self.history is None:
+            return
+        try:
+            metadata = self.ollama_client.get_model_metadata(model_name)
+            digest = metadata.get('digest', 'unknown') if "error" not in metadata else 'unknown'
+            version = self.ollama_client.get_server_version() or 'unknown'
+            result['digest'] = digest
+            result['server_version'] = version
+            result['config_key'] = self.history.record(
+                self.ollama_client.base_url, model_name, digest, prompt, version, result, suite=suite
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record benchmark history for {model_name}: {str(e)}")
+
+    def run_suite(self, model_name, repeats=5, prompt=DEFAULT_PROMPT, sample_interval=None, on_run=None,
+                  warmup=True):
+        """Run repeated benchmarks and compare them to the configuration baseline.
+
+        With ``warmup`` a first run is made and discarded so a cold model
+        load does not skew the TTFT distribution. ``repeats`` is capped at
+        MAX_REPEATS. ``on_run(index, repeats, result)`` is called after each
+        measured run for progress reporting.
+        """
+        repeats = max(1, min(repeats, MAX_REPEATS))
+        warmup_result = None
+        if warmup:
+            logger.info(f"Benchmark warm-up run for {model_name}")
+            warmup_result = self.start_benchmark(model_name, prompt=prompt, sample_interval=sample_interval,
+                                                 record=False)
+            if 'success' not in warmup_result:
+                return warmup_result
+
+        # The runs of a suite are compared together against the baseline window
+        suite_id = uuid.uuid4().hex
+        runs = []
+        for i in range(repeats):
+            logger.info(f"Benchmark run {i + 1}/{repeats} for {model_name}")
+            result = self.start_benchmark(model_name, prompt=prompt, sample_interval=sample_interval,
+                                          suite=suite_id)
+            # Errors before the run starts (server down, already running) abort the suite
+            if 'success' not in result:
+                return result
+            runs.append(result)
+            if on_run is not None:
+                on_run(i + 1, repeats, result)
+
+        suite = {
+            "id": suite_id,
+            "model": model_name,
+            "repeats": repeats,
+            "runs": runs,
+            "succeeded": sum(1 for run in runs if run['success'])
+        }
+        if warmup_result is not None:
+            suite['warmup'] = {
+                "success": warmup_result['success'],
+                "load_duration": warmup_result.get('load_duration'),
+                "ttft": warmup_result.get('ttft'),
+                "error": warmup_result.get('error')
+            }
+        config_key = next((run.get('config_key') for run in reversed(runs) if run.get('config_key')), None)
+        if self.history is not None and config_key:
+            suite['comparison'] = self.history.compare_key(config_key)
+        return suite
+
     def get_benchmark_status(self, model_name):
         """Get current benchmark status for a model"""
         try:
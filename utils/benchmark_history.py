@@ -0,0 +1,260 @@
+import os
+import json
+import random
+import hashlib
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+METRICS = {
+    # metric -> True when higher is better
+    'tokens_per_second': True,
+    'ttft': False,
+}
+BOOTSTRAP_SAMPLES = 2000
+CONFIDENCE = 0.95
+DEFAULT_TOLERANCE = 0.05  # relative change tolerated before flagging
+MAX_RUNS = 200  # candidate runs kept per configuration
+WINDOW = 10  # runs compared when they are not part of a suite (e.g. canary probes)
+
+
+def bootstrap_ci(values, samples=BOOTSTRAP_SAMPLES, confidence=CONFIDENCE, seed=0):
+    """Mean and percentile bootstrap confidence interval of the mean"""
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    mean = sum(values) / len(values)
+    if len(values) == 1:
+        return {"mean": mean, "low": mean, "high": mean, "n": 1}
+
+    rng = random.Random(seed)
+    n = len(values)
+    means = sorted(
+        sum(rng.choices(values, k=n)) / n
+        for _ in range(samples)
+    )
+    alpha = (1 - confidence) / 2
+    low = means[int(alpha * (samples - 1))]
+    high = means[int((1 - alpha) * (samples - 1))]
+    return {"mean": mean, "low": low, "high": high, "n": n}
+
+
+def compare(baseline, candidate, higher_is_better, tolerance=DEFAULT_TOLERANCE):
+    """Classify a candidate interval against a baseline interval"""
+    if not baseline or not candidate or not baseline['mean']:
+        return {"status": "insufficient_data"}
+    change = (candidate['mean'] - baseline['mean']) / baseline['mean']
+    worse = change < 0 if higher_is_better else change > 0
+    # Require both a meaningful shift and non-overlapping intervals
+    disjoint = candidate['high'] < baseline['low'] or candidate['low'] > baseline['high']
+    if abs(change) <= tolerance or not disjoint:
+        status = "unchanged"
+    elif worse:
+        status = "regression"
+    else:
+        status = "improvement"
+    return {"status": status, "change": change}
+
+
+class BenchmarkHistory:
+    """Persist benchmark runs per configuration and detect regressions.
+
+    A configuration is a (server, model, digest, prompt) tuple. Its
+    baseline is a pinned window of runs: the first suite recorded (or the
+    first ``WINDOW`` runs outside suites), re-pinned with ``set_baseline``.
+    Later runs never join the baseline; the latest suite (or the last
+    ``WINDOW`` runs) is compared against it whatever the Ollama version, so
+    driver or hardware changes are caught as well as server upgrades.
+
+    The file is shared by the web app and CLI runs, so it is re-read before
+    every update and every report instead of being cached in memory.
+    """
+
+    def __init__(self, path=None, tolerance=DEFAULT_TOLERANCE):
+        self.path = path or self._get_history_path()
+        self.tolerance = tolerance
+        self._lock = threading.Lock()
+
+    def _get_history_path(self):
+        """Get history file from environment or default"""
+        return os.environ.get(
+            'OLLAMA_MANAGER_BENCHMARK_HISTORY',
+            os.path.join(os.path.expanduser('~'), '.cache', 'ollama-manager', 'benchmark_history.json')
+        )
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            data = data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault('configs', {})
+        for config in data['configs'].values():
+            if 'versions' in config:
+                self._migrate(config)
+        return data
+
+    @staticmethod
+    def _migrate(config):
+        """Convert the older per-version layout to a baseline window"""
+        versions = config.pop('versions')
+        baseline_version = config.get('baseline')
+        runs = []
+        for version, version_runs in versions.items():
+            for run in version_runs:
+                run.update(version=version, suite=None)
+            if version != baseline_version:
+                runs.extend(version_runs)
+        runs.sort(key=lambda run: run.get('timestamp') or '')
+        config['baseline'] = {
+            "version": baseline_version,
+            "suite": None,
+            "complete": True,
+            "runs": versions.get(baseline_version, [])
+        }
+        config['runs'] = runs[-MAX_RUNS:]
+
+    def _save(self, data):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to persist benchmark history: {str(e)}")
+
+    @staticmethod
+    def config_key(server, model, digest, prompt):
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        return f"{server}|{model}|{digest}|{prompt_hash}"
+
+    def record(self, server, model, digest, prompt, version, result, suite=None):
+        """Record a successful benchmark result, ``suite`` groups the runs of one suite"""
+        key = self.config_key(server, model, digest, prompt)
+        run = {metric: result.get(metric) for metric in METRICS}
+        run['timestamp'] = result.get('timestamp') or datetime.now().isoformat()
+        run['version'] = version
+        run['suite'] = suite
+        with self._lock:
+            data = self._load()
+            config = data['configs'].setdefault(key, {
+                "server": server,
+                "model": model,
+                "digest": digest,
+                "baseline": {"version": version, "suite": suite, "complete": False, "runs": []},
+                "runs": []
+            })
+            baseline = config['baseline']
+            # Only the first suite (or window) fills the baseline, then it is frozen
+            fills_baseline = (not baseline['complete'] and baseline['suite'] == suite
+                              and baseline['version'] == version
+                              and (suite is not None or len(baseline['runs']) < WINDOW))
+            if fills_baseline:
+                baseline['runs'].append(run)
+            else:
+                baseline['complete'] = True
+                config['runs'].append(run)
+                del config['runs'][:-MAX_RUNS]
+            config['latest'] = version
+            self._save(data)
+        return key
+
+    @staticmethod
+    def _candidate_runs(config, version=None):
+        """The latest suite, or the last WINDOW runs recorded outside suites"""
+        runs = [run for run in config['runs'] if version is None or run.get('version') == version]
+        if not runs:
+            return []
+        suite = runs[-1].get('suite')
+        if suite is not None:
+            return [run for run in runs if run.get('suite') == suite]
+        window = []
+        for run in reversed(runs):
+            if run.get('suite') is not None or len(window) >= WINDOW:
+                break
+            window.append(run)
+        return window[::-1]
+
+    def set_baseline(self, key, version=None):
+        """Pin the latest suite or window (of ``version`` if given) as the baseline"""
+        with self._lock:
+            data = self._load()
+            config = data['configs'].get(key)
+            window = self._candidate_runs(config, version) if config is not None else []
+            if not window:
+                return {"error": {
+                    "message": "Configuration ou version de référence introuvable",
+                    "code": "BASELINE_NOT_FOUND",
+                    "details": f"{key} @ {version or 'latest'}"
+                }}
+            config['baseline'] = {
+                "version": window[-1].get('version'),
+                "suite": window[-1].get('suite'),
+                "complete": True,
+                "pinned_at": datetime.now().isoformat(),
+                "runs": window
+            }
+            # Runs up to the new baseline are superseded by it
+            last = max(index for index, run in enumerate(config['runs']) if run in window)
+            config['runs'] = [run for run in config['runs'][last + 1:] if run not in window]
+            self._save(data)
+        return {"status": "success", "key": key, "baseline": config['baseline']['version'],
+                "runs": len(window)}
+
+    def _compare_config(self, key, config, version=None):
+        baseline_runs = config['baseline']['runs']
+        candidate_runs = self._candidate_runs(config, version)
+
+        metrics = {}
+        for metric, higher_is_better in METRICS.items():
+            baseline = bootstrap_ci([run.get(metric) for run in baseline_runs])
+            candidate = bootstrap_ci([run.get(metric) for run in candidate_runs])
+            comparison = {"status": "baseline"} if not candidate_runs else \
+                compare(baseline, candidate, higher_is_better, self.tolerance)
+            metrics[metric] = {"baseline": baseline, "candidate": candidate, **comparison}
+
+        statuses = {metric['status'] for metric in metrics.values()}
+        if "regression" in statuses:
+            status = "regression"
+        elif "improvement" in statuses:
+            status = "improvement"
+        else:
+            status = next(iter(statuses)) if len(statuses) == 1 else "unchanged"
+        return {
+            "key": key,
+            "server": config['server'],
+            "model": config['model'],
+            "digest": config['digest'],
+            "baseline_version": config['baseline']['version'],
+            "candidate_version": candidate_runs[-1].get('version') if candidate_runs else config.get('latest'),
+            "baseline_suite": config['baseline']['suite'],
+            "candidate_suite": candidate_runs[-1].get('suite') if candidate_runs else None,
+            "status": status,
+            "metrics": metrics
+        }
+
+    def compare_key(self, key, version=None):
+        """Compare the latest suite or window (of ``version`` if given) to the baseline"""
+        with self._lock:
+            config = self._load()['configs'].get(key)
+            if config is None:
+                return None
+        return self._compare_config(key, config, version)
+
+    def report(self):
+        """Compare the latest suite or window of every configuration to its baseline"""
+        with self._lock:
+            configs = self._load()['configs']
+
+        comparisons = [self._compare_config(key, config) for key, config in configs.items()]
+        return {
+            "tolerance": self.tolerance,
+            "confidence": CONFIDENCE,
+            "regressions": [c for c in comparisons if c['status'] == 'regression'],
+            "improvements": [c for c in comparisons if c['status'] == 'improvement'],
+            "configs": comparisons
+        }
@@ -0,0 +1,106 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from utils.ollama_client import MODEL_OPERATIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARALLELISM = 8
+MAX_PARALLELISM = 32
+
+
+class BulkOperations:
+    """Run a model operation over many models and servers concurrently.
+
+    Each server is health-checked once, then every (server, model) item runs
+    on a thread pool capped at ``parallel`` workers.
+    """
+
+    def __init__(self, ollama_client, default_parallel=DEFAULT_PARALLELISM):
+        self.ollama_client = ollama_client
+        self.default_parallel = default_parallel
+
+    def _run_item(self, operation, server, model_name, keep_alive):
+        start = time.monotonic()
+        try:
+            result = self.ollama_client.model_operation(operation, model_name, base_url=server, keep_alive=keep_alive)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Bulk {operation} failed for {model_name} on {server}: {str(e)}")
+            result = self.ollama_client.create_error_response(
+                f"Erreur lors de l'opération {operation} sur le modèle {model_name}",
+                "CONNECTION_ERROR",
+                str(e)
+            )
+        return {
+            "server": server,
+            "model": model_name,
+            "operation": operation,
+            "elapsed": time.monotonic() - start,
+            **result
+        }
+
+    def validate(self, operation, models):
+        """Return an error response for invalid input, None otherwise"""
+        if operation not in MODEL_OPERATIONS:
+            return self.ollama_client.create_error_response(
+                f"Opération inconnue: {operation}",
+                "INVALID_OPERATION",
+                f"Opérations disponibles: {', '.join(MODEL_OPERATIONS)}"
+            )
+        if not models or not all(isinstance(model, str) and model for model in models):
+            return self.ollama_client.create_error_response(
+                "Liste de modèles invalide",
+                "INVALID_MODELS",
+                "Fournissez une liste non vide de noms de modèles"
+            )
+        return None
+
+    def iter_results(self, operation, models, servers=None, parallel=None, keep_alive=None):
+        """Yield per-item results as they complete"""
+        error = self.validate(operation, models)
+        if error:
+            yield error
+            return
+
+        servers = servers or [self.ollama_client.base_url]
+        parallel = max(1, min(parallel or self.default_parallel, MAX_PARALLELISM))
+
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            reachable = dict(zip(servers, executor.map(self.ollama_client.ping, servers)))
+            futures = []
+            for server in servers:
+                if not reachable[server]:
+                    for model_name in models:
+                        yield {
+                            "server": server,
+                            "model": model_name,
+                            "operation": operation,
+                            "elapsed": 0,
+                            **self.ollama_client.create_error_response(
+                                "Impossible de se connecter au serveur Ollama",
+                                "CONNECTION_ERROR",
+                                server
+                            )
+                        }
+                    continue
+                for model_name in models:
+                    futures.append(executor.submit(self._run_item, operation, server, model_name, keep_alive))
+
+            for future in as_completed(futures):
+                yield future.result()
+
+    def run(self, operation, models, servers=None, parallel=None, keep_alive=None):
+        """Run the operation and collect all per-item results"""
+        error = self.validate(operation, models)
+        if error:
+            return error
+        start = time.monotonic()
+        results = list(self.iter_results(operation, models, servers, parallel, keep_alive))
+        return {
+            "operation": operation,
+            "results": results,
+            "succeeded": sum(1 for result in results if "error" not in result),
+            "failed": sum(1 for result in results if "error" in result),
+            "elapsed": time.monotonic() - start
+        }
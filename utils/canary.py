@@ -0,0 +1,311 @@
+import json
+import re
+import time
+import threading
+import logging
+from collections import deque
+from datetime import datetime, timezone
+import requests
+
+logger = logging.getLogger(__name__)
+
+CANARY_PROMPT = "Reply with the single word: ok"
+DEFAULT_THRESHOLDS = {
+    'ttft': 2.0,  # seconds, alert when above
+    'tokens_per_second': 5.0,  # alert when below
+}
+MIN_REMAINING_KEEP_ALIVE = 10  # seconds, skip models about to be evicted
+RELOAD_LOAD_DURATION = 1.0  # seconds, a longer load means the model was (re)loaded
+MIN_INTERVAL = 5  # seconds between probe cycles
+HISTORY_SIZE = 500
+ALERTS_SIZE = 200
+
+
+def _parse_expires_at(expires_at):
+    """Parse /api/ps expires_at (RFC 3339, possibly with nanoseconds)"""
+    if not expires_at:
+        return None
+    # Python only handles microseconds
+    value = re.sub(r'(\.\d{6})\d+', r'\1', expires_at).replace('Z', '+00:00')
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+class CanaryProber:
+    """Periodically probe resident models with a tiny fixed prompt.
+
+    Only models reported by /api/ps are probed, and residency is re-checked
+    right before each probe. The probe passes the model's remaining
+    keep-alive so it never extends residency, and only uses options that do
+    not force a reload. Probes run one at a time, at most
+    ``max_probes_per_minute``, and a cycle is skipped while the GPU is busy
+    or a benchmark is running so real traffic keeps priority.
+    """
+
+    def __init__(self, ollama_client, gpu_monitor=None, model_benchmark=None, history=None,
+                 interval=60, thresholds=None, max_probes_per_minute=6, busy_gpu_utilization=80,
+                 prompt=CANARY_PROMPT, num_predict=8):
+        self.ollama_client = ollama_client
+        self.gpu_monitor = gpu_monitor
+        self.model_benchmark = model_benchmark
+        self.history = history
+        self.interval = interval
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.max_probes_per_minute = max_probes_per_minute
+        self.busy_gpu_utilization = busy_gpu_utilization
+        self.prompt = prompt
+        self.num_predict = num_predict
+
+        self.results = {}  # model -> deque of probe results
+        self.active_alerts = {}  # model -> alert
+        self.alerts = deque(maxlen=ALERTS_SIZE)
+        self.last_cycle = None
+        self._probe_times = deque()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def stopping(self):
+        """Stop was requested but the scheduler is still finishing a probe"""
+        return self.running and self._stop_event.is_set()
+
+    def start(self, interval=None):
+        """Start the probe scheduler in a daemon thread.
+
+        Returns False while a stopped scheduler is still finishing its last
+        probe, so two schedulers never run at once.
+        """
+        if self.stopping:
+            logger.warning("Canary probes are still stopping, not restarting")
+            return False
+        if interval:
+            self.interval = interval
+        if self.running:
+            return True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Canary probes started (every {self.interval}s)")
+        return True
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                # Keep the reference: start() refuses until the probe returns
+                logger.info("Canary probes stopping after the current probe")
+                return
+            self._thread = None
+        logger.info("Canary probes stopped")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_cycle()
+            except Exception as e:
+                logger.error(f"Canary cycle failed: {str(e)}")
+            self._stop_event.wait(self.interval)
+
+    def _resident_models(self):
+        """Resident models with their remaining keep-alive in seconds"""
+        loaded = self.ollama_client.list_loaded_models()
+        if "error" in loaded:
+            return None
+        now = datetime.now(timezone.utc)
+        resident = {}
+        for model in loaded['models']:
+            name = model.get('name') or model.get('model')
+            expires_at = _parse_expires_at(model.get('expires_at'))
+            remaining = (expires_at - now).total_seconds() if expires_at else None
+            resident[name] = {
+                "remaining": remaining,
+                "size": model.get('size'),
+                "size_vram": model.get('size_vram')
+            }
+        return resident
+
+    def _busy_reason(self):
+        if self.model_benchmark is not None and self.model_benchmark.active_benchmarks:
+            return "benchmark_running"
+        if self.gpu_monitor is not None:
+            stats = self.gpu_monitor.get_stats()
+            if stats.get('status') == 'available' and stats.get('gpu_utilization', 0) >= self.busy_gpu_utilization:
+                return "gpu_busy"
+        return None
+
+    def _rate_limited(self):
+        now = time.monotonic()
+        while self._probe_times and now - self._probe_times[0] > 60:
+            self._probe_times.popleft()
+        return len(self._probe_times) >= self.max_probes_per_minute
+
+    def run_cycle(self):
+        """Probe every resident model once, within the rate limit"""
+        cycle = {"timestamp": datetime.now().isoformat(), "probed": [], "skipped": {}}
+        self.last_cycle = cycle
+
+        busy = self._busy_reason()
+        if busy:
+            cycle["skipped"]["*"] = busy
+            logger.info(f"Canary cycle skipped: {busy}")
+            return cycle
+
+        resident = self._resident_models()
+        if resident is None:
+            cycle["skipped"]["*"] = "ps_unavailable"
+            return cycle
+
+        for model_name in sorted(resident):
+            if self._stop_event.is_set():
+                break
+            if self._rate_limited():
+                cycle["skipped"][model_name] = "rate_limited"
+                continue
+            # Re-check residency right before probing, the model may have been evicted
+            current = self._resident_models() or {}
+            info = current.get(model_name)
+            if info is None:
+                cycle["skipped"][model_name] = "evicted"
+                continue
+            remaining = info['remaining']
+            if remaining is not None and remaining < MIN_REMAINING_KEEP_ALIVE:
+                cycle["skipped"][model_name] = "expiring"
+                continue
+
+            self._probe_times.append(time.monotonic())
+            result = self.probe(model_name, remaining, info)
+            self._record(model_name, result)
+            cycle["probed"].append(model_name)
+        return cycle
+
+    def probe(self, model_name, remaining=None, info=None):
+        """Send the canary prompt and measure TTFT and tokens/sec"""
+        payload = {
+            "model": model_name,
+            "prompt": self.prompt,
+            "stream": True,
+            # Only options that do not change the runner, to avoid a reload
+            "options": {"num_predict": self.num_predict, "temperature": 0}
+        }
+        if remaining is not None:
+            # Keep the current expiry instead of resetting the keep-alive timer
+            payload["keep_alive"] = f"{max(int(remaining), 1)}s"
+
+        result = {
+            "model": model_name,
+            "timestamp": datetime.now().isoformat(),
+            "ttft": None,
+            "tokens_per_second": None,
+            "size_vram": (info or {}).get('size_vram'),
+            "size": (info or {}).get('size')
+        }
+        start = time.monotonic()
+        try:
+            with requests.post(f"{self.ollama_client.base_url}/api/generate", json=payload,
+                               stream=True, timeout=self.ollama_client.timeout) as response:
+                if response.status_code != 200:
+                    result["error"] = response.text or f"HTTP {response.status_code}"
+                    return result
+                for line in response.iter_lines(chunk_size=None):
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        result["error"] = chunk["error"]
+                        return result
+                    if chunk.get("response") and result["ttft"] is None:
+                        result["ttft"] = time.monotonic() - start
+                    if chunk.get("done"):
+                        if chunk.get("eval_count") and chunk.get("eval_duration"):
+                            result["tokens_per_second"] = chunk["eval_count"] / (chunk["eval_duration"] / 1e9)
+                        result["load_duration"] = chunk.get("load_duration", 0) / 1e9
+                        break
+        except (requests.exceptions.RequestException, ValueError) as e:
+            result["error"] = str(e)
+        result["elapsed"] = time.monotonic() - start
+        return result
+
+    def _check_thresholds(self, result):
+        breaches = []
+        if "error" in result:
+            breaches.append({"metric": "error", "value": result["error"]})
+            return breaches
+        ttft = result.get("ttft")
+        if ttft is not None and ttft > self.thresholds['ttft']:
+            breaches.append({"metric": "ttft", "value": ttft, "threshold": self.thresholds['ttft']})
+        tps = result.get("tokens_per_second")
+        if tps is not None and tps < self.thresholds['tokens_per_second']:
+            breaches.append({"metric": "tokens_per_second", "value": tps,
+                             "threshold": self.thresholds['tokens_per_second']})
+        if result.get("load_duration", 0) > RELOAD_LOAD_DURATION:
+            breaches.append({"metric": "load_duration", "value": result["load_duration"],
+                             "threshold": RELOAD_LOAD_DURATION})
+        # Partial CPU spill: part of the model no longer fits in VRAM
+        if result.get("size") and result.get("size_vram") is not None and result["size_vram"] < result["size"]:
+            breaches.append({"metric": "size_vram", "value": result["size_vram"], "threshold": result["size"]})
+        return breaches
+
+    def _record(self, model_name, result):
+        breaches = self._check_thresholds(result)
+        result["breaches"] = breaches
+        with self._lock:
+            self.results.setdefault(model_name, deque(maxlen=HISTORY_SIZE)).append(result)
+            alert = self.active_alerts.get(model_name)
+            if breaches and alert is not None:
+                # Ongoing alert: update it in place, only transitions go to the log
+                alert["breaches"] = breaches
+                alert["last_seen"] = result["timestamp"]
+                alert["consecutive"] += 1
+            elif breaches:
+                alert = {
+                    "model": model_name,
+                    "breaches": breaches,
+                    "since": result["timestamp"],
+                    "last_seen": result["timestamp"],
+                    "consecutive": 1
+                }
+                self.active_alerts[model_name] = alert
+                self.alerts.append({"event": "started", **alert})
+                logger.warning(f"Canary alert for {model_name}: {breaches}")
+            elif alert is not None:
+                del self.active_alerts[model_name]
+                self.alerts.append({**alert, "event": "resolved", "resolved_at": result["timestamp"]})
+                logger.info(f"Canary alert resolved for {model_name}")
+
+        if self.history is not None and "error" not in result:
+            try:
+                version = self.ollama_client.get_server_version() or 'unknown'
+                metadata = self.ollama_client.get_model_metadata(model_name)
+                digest = metadata.get('digest', 'unknown') if "error" not in metadata else 'unknown'
+                self.history.record(self.ollama_client.base_url, model_name, digest, self.prompt, version, result)
+            except Exception as e:
+                logger.warning(f"Failed to record canary history for {model_name}: {str(e)}")
+
+    def get_status(self):
+        """Scheduler state, latest results per model and alerts"""
+        with self._lock:
+            return {
+                "running": self.running,
+                "stopping": self.stopping,
+                "interval": self.interval,
+                "thresholds": self.thresholds,
+                "max_probes_per_minute": self.max_probes_per_minute,
+                "last_cycle": self.last_cycle,
+                "latest": {model: results[-1] for model, results in self.results.items() if results},
+                "active_alerts": [dict(alert) for alert in self.active_alerts.values()],
+                "recent_alerts": list(self.alerts)[-20:]
+            }
+
+    def get_history(self, model_name):
+        """Probe results recorded for a model"""
+        with self._lock:
+            return list(self.results.get(model_name, []))
@@ -0,0 +1,49 @@
+import gzip
+
+MIN_COMPRESS_SIZE = 512  # bytes, smaller bodies are not worth the CPU
+COMPRESS_LEVEL = 6
+COMPRESSIBLE_MIMETYPES = ('application/json',)
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header allows gzip.
+
+    An explicit gzip entry wins over the ``*`` wildcard, whatever the order.
+    """
+    qualities = {}
+    for part in (accept_encoding or '').split(','):
+        coding, *params = part.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    quality = qualities.get('gzip', qualities.get('*', 0.0))
+    return quality > 0
+
+
+def compress_response(response, accept_encoding):
+    """Gzip a buffered JSON response in place when the client accepts it"""
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough
+            or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers
+            or not 200 <= response.status_code < 300
+            or not accepts_gzip(accept_encoding)):
+        return response
+
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_SIZE:
+        return response
+
+    response.set_data(gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -0,0 +1,302 @@
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODELS = ['llama3:8b', 'mistral:7b', 'qwen2:1.5b', 'phi3:mini']
+DEFAULT_KEEP_ALIVE = 300  # seconds, Ollama's default
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def _keep_alive_seconds(keep_alive):
+    """Parse a keep_alive value (seconds or a duration like '5m'); None means forever"""
+    if keep_alive is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(keep_alive, (int, float)):
+        seconds = float(keep_alive)
+    else:
+        match = re.fullmatch(r'\s*(-?\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*', str(keep_alive))
+        if not match:
+            return DEFAULT_KEEP_ALIVE
+        seconds = float(match.group(1)) * DURATION_UNITS[match.group(2) or 's']
+    return None if seconds < 0 else seconds
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections are expected under load
+        logger.debug(f"Fake server connection error from {client_address}")
+
+
+class FakeOllamaServer:
+    """In-process fake of the Ollama HTTP API for offline benchmarks.
+
+    Serves /api/version, /api/tags, /api/ps, /api/show, /api/generate
+    (streamed), /api/pull and /api/delete with configurable latency, token
+    rate, model catalog, residency and failure injection. Resident models
+    expire after their keep_alive like in Ollama.
+    """
+
+    def __init__(self, models=None, running=None, latency=0.0, token_rate=50.0,
+                 prompt_eval_time=0.05, tokens=20, failure_rate=0.0,
+                 host='127.0.0.1', port=0, seed=0, version='0.0.0-fake'):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.prompt_eval_time = prompt_eval_time
+        self.tokens = tokens
+        self.failure_rate = failure_rate
+        self.version = version
+        self.models = {}
+        self.running = {}  # name -> expires_at, None when kept forever
+        self.requests = {}  # path -> count
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        for name in models or DEFAULT_MODELS:
+            self.add_model(name)
+        for name in running or []:
+            self._load(self._normalize(name), -1)
+
+        self._server = _QuietHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @staticmethod
+    def _normalize(name):
+        return name if ':' in name else f"{name}:latest"
+
+    def add_model(self, name, size=None):
+        name = self._normalize(name)
+        digest = hashlib.sha256(name.encode('utf-8')).hexdigest()
+        model = {
+            "name": name,
+            "model": name,
+            "size": size or 1_000_000_000 + int(digest[:6], 16) * 1000,
+            "digest": digest,
+            "modified_at": datetime.now(timezone.utc).isoformat(),
+            "details": {
+                "format": "gguf",
+                "family": name.split(':')[0].rstrip('0123456789') or 'llama',
+                "parameter_size": "7B",
+                "quantization_level": "Q4_K_M"
+            }
+        }
+        with self._lock:
+            self.models[name] = model
+
+    def get_model(self, name):
+        with self._lock:
+            return self.models.get(self._normalize(name)) if name else None
+
+    def remove_model(self, name):
+        with self._lock:
+            self.running.pop(name, None)
+            return self.models.pop(name, None)
+
+    def _load(self, name, keep_alive):
+        """Mark a model resident, (re)setting its expiry; returns False when unloaded"""
+        seconds = _keep_alive_seconds(keep_alive)
+        with self._lock:
+            if seconds == 0:
+                self.running.pop(name, None)
+                return False
+            self.running[name] = (datetime.now(timezone.utc) + timedelta(seconds=seconds)
+                                  if seconds is not None else None)
+            return True
+
+    def loaded_models(self):
+        """Resident models as /api/ps reports them, dropping expired ones"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for name, expires_at in list(self.running.items()):
+                if expires_at is not None and expires_at <= now:
+                    del self.running[name]
+            loaded = []
+            for name in sorted(self.running):
+                model = self.models.get(name)
+                if model is None:
+                    continue
+                # Ollama reports a far-future expiry for models kept forever
+                expires_at = self.running[name] or now + timedelta(days=365 * 100)
+                loaded.append({
+                    **model,
+                    "size_vram": model["size"],
+                    "context_length": 2048,
+                    "expires_at": expires_at.isoformat().replace('+00:00', 'Z')
+                })
+            return loaded
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"Fake Ollama server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _should_fail(self):
+        if not self.failure_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunk(self, payload):
+                data = (json.dumps(payload) + "\n").encode('utf-8')
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if not length:
+                    return {}
+                try:
+                    return json.loads(self.rfile.read(length))
+                except ValueError:
+                    return {}
+
+            def _begin(self):
+                with fake._lock:
+                    fake.requests[self.path] = fake.requests.get(self.path, 0) + 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if fake._should_fail():
+                    self._send_json({"error": "injected failure"}, status=500)
+                    return False
+                return True
+
+            def _model(self, data):
+                return fake.get_model(data.get("model") or data.get("name") or "")
+
+            def do_GET(self):
+                if not self._begin():
+                    return
+                if self.path == "/api/version":
+                    self._send_json({"version": fake.version})
+                elif self.path == "/api/tags":
+                    with fake._lock:
+                        models = list(fake.models.values())
+                    self._send_json({"models": models})
+                elif self.path == "/api/ps":
+                    self._send_json({"models": fake.loaded_models()})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_DELETE(self):
+                if not self._begin():
+                    return
+                model = self._model(self._read_json())
+                if self.path != "/api/delete" or model is None:
+                    self._send_json({"error": "model not found"}, status=404)
+                    return
+                fake.remove_model(model["name"])
+                self._send_json({})
+
+            def do_POST(self):
+                if not self._begin():
+                    return
+                data = self._read_json()
+                if self.path == "/api/show":
+                    model = self._model(data)
+                    if model is None:
+                        self._send_json({"error": "model not found"}, status=404)
+                        return
+                    self._send_json({
+                        "details": model["details"],
+                        "template": "{{ .Prompt }}",
+                        "parameters": "",
+                        "model_info": {
+                            "general.architecture": "llama",
+                            "general.parameter_count": 7_000_000_000,
+                            "llama.context_length": 8192,
+                            "llama.embedding_length": 4096,
+                            "llama.block_count": 32,
+                            "llama.attention.head_count": 32,
+                            "llama.attention.head_count_kv": 8
+                        }
+                    })
+                elif self.path == "/api/generate":
+                    self._generate(data)
+                elif self.path == "/api/pull":
+                    name = fake._normalize(data.get("model") or data.get("name") or "")
+                    fake.add_model(name)
+                    self._send_json({"status": "success"})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def _generate(self, data):
+                model = self._model(data)
+                if model is None:
+                    self._send_json({"error": "model not found"}, status=404)
+                    return
+                # keep_alive 0 unloads the model once the request is answered
+                if not fake._load(model["name"], data.get("keep_alive")) and not data.get("prompt"):
+                    self._send_json({"model": model["name"], "done": True, "done_reason": "unload"})
+                    return
+                if data.get("stream") is False or not data.get("prompt"):
+                    self._send_json({"model": model["name"], "response": "", "done": True})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                time.sleep(fake.prompt_eval_time)
+                delay = 1.0 / fake.token_rate if fake.token_rate else 0
+                for _ in range(fake.tokens):
+                    self._send_chunk({"model": model["name"], "response": " tok", "done": False})
+                    if delay:
+                        time.sleep(delay)
+                self._send_chunk({
+                    "model": model["name"],
+                    "response": "",
+                    "done": True,
+                    "prompt_eval_count": 8,
+                    "prompt_eval_duration": int(fake.prompt_eval_time * 1e9),
+                    "eval_count": fake.tokens,
+                    "eval_duration": int(fake.tokens * delay * 1e9)
+                })
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
@@ -60,3 +60,37 @@ class GPUMonitor:
                 "temperature": 0,
                 "message": str(e)
             }
+
+    def get_gpus(self):
+        """Per-GPU memory (MiB), used for placement planning"""
+        if not shutil.which('nvidia-smi'):
+            return {"status": "no_gpu", "gpus": [], "message": "No NVIDIA GPU detected"}
+
+        try:
+            result = subprocess.run(
+                ['nvidia-smi', '--query-gpu=index,name,memory.total,memory.used,memory.free', '--format=csv,noheader,nounits'],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+
+            if result.returncode != 0:
+                return {"status": "error", "gpus": [], "message": "Failed to get GPU stats"}
+
+            gpus = []
+            for line in result.stdout.strip().splitlines():
+                fields = [field.strip() for field in line.split(',')]
+                if len(fields) < 5:
+                    continue
+                gpus.append({
+                    "index": int(fields[0]),
+                    "name": fields[1],
+                    "memory_total": float(fields[2]),
+                    "memory_used": float(fields[3]),
+                    "memory_free": float(fields[4])
+                })
+            return {"status": "available", "gpus": gpus}
+        except subprocess.TimeoutExpired:
+            return {"status": "timeout", "gpus": [], "message": "GPU stats collection timed out"}
+        except Exception as e:
+            return {"status": "error", "gpus": [], "message": str(e)}
@@ -0,0 +1,168 @@
+import time
+import threading
+import logging
+import psutil
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL = 0.05  # seconds
+
+
+class MetricsSampler:
+    """Background sampler recording system metrics on a monotonic timeline.
+
+    Samples are timestamped in seconds relative to ``start()`` so they can be
+    aligned with other events (e.g. the token stream of a benchmark) recorded
+    through ``elapsed()`` and ``mark()``. GPU readings come from a separate
+    thread, since each one spawns nvidia-smi, and are kept in ``gpu_samples``
+    with their own timestamp and phase.
+    """
+
+    def __init__(self, interval=0.1, gpu_monitor=None, gpu_interval=0.5):
+        self.interval = max(float(interval), MIN_INTERVAL)
+        self.gpu_monitor = gpu_monitor
+        self.gpu_interval = max(float(gpu_interval), self.interval)
+        self.samples = []
+        self.gpu_samples = []
+        self.marks = []
+        self.phase = None
+        self._origin = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._gpu_thread = None
+
+    def elapsed(self):
+        """Seconds elapsed since the sampler was started"""
+        if self._origin is None:
+            return 0.0
+        return time.monotonic() - self._origin
+
+    def mark(self, phase):
+        """Record a phase transition at the current point of the timeline"""
+        with self._lock:
+            self.phase = phase
+            self.marks.append({'t': self.elapsed(), 'phase': phase})
+
+    def start(self, phase=None):
+        """Start sampling in a daemon thread"""
+        self._origin = time.monotonic()
+        self._stop_event.clear()
+        # Prime the counters: the first call of cpu_percent(None) returns 0.0
+        psutil.cpu_percent(interval=None)
+        if phase:
+            self.mark(phase)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        if self.gpu_monitor is not None:
+            self._gpu_thread = threading.Thread(target=self._run_gpu)
+            self._gpu_thread.daemon = True
+            self._gpu_thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and return the collected CPU samples"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.interval * 2, 1))
+            self._thread = None
+        if self._gpu_thread is not None:
+            # nvidia-smi calls are bounded by GPUMonitor's 5s timeout
+            self._gpu_thread.join(timeout=6)
+            self._gpu_thread = None
+        with self._lock:
+            return list(self.samples)
+
+    def phase_at(self, t):
+        """Phase in effect at a point of the timeline"""
+        phase = None
+        with self._lock:
+            for mark in self.marks:
+                if mark['t'] > t:
+                    break
+                phase = mark['phase']
+        return phase
+
+    def _sample_gpu(self):
+        try:
+            stats = self.gpu_monitor.get_stats()
+        except Exception as e:
+            logger.debug(f"GPU sampling failed: {str(e)}")
+            return None
+        if stats.get('status') != 'available':
+            return None
+        return stats
+
+    def _run(self):
+        next_tick = time.monotonic() + self.interval
+
+        while not self._stop_event.wait(max(next_tick - time.monotonic(), 0)):
+            sample = {
+                't': time.monotonic() - self._origin,
+                # Non-blocking: utilisation since the previous call
+                'cpu_percent': psutil.cpu_percent(interval=None),
+                'memory_percent': psutil.virtual_memory().percent,
+            }
+            with self._lock:
+                sample['phase'] = self.phase
+                self.samples.append(sample)
+
+            # Keep a fixed cadence; skip ticks that a slow sample overran
+            next_tick += self.interval
+            now = time.monotonic()
+            if next_tick < now:
+                next_tick = now + self.interval
+
+    def _run_gpu(self):
+        next_tick = time.monotonic()
+
+        while not self._stop_event.wait(max(next_tick - time.monotonic(), 0)):
+            started = time.monotonic()
+            stats = self._sample_gpu()
+            if stats is None:
+                # No usable GPU, stop paying for nvidia-smi calls
+                return
+            finished = time.monotonic()
+            # nvidia-smi takes a while to answer; date the reading mid-call
+            t = (started + finished) / 2 - self._origin
+            sample = {
+                't': t,
+                'phase': self.phase_at(t),
+                'gpu_utilization': stats['gpu_utilization'],
+                'gpu_memory_used': stats['memory_used']
+            }
+            with self._lock:
+                self.gpu_samples.append(sample)
+
+            next_tick = max(next_tick + self.gpu_interval, finished)
+
+    @staticmethod
+    def summarize(samples, gpu_samples=()):
+        """Average metrics per phase, GPU values only over actual readings"""
+        phases = {}
+
+        def bucket_for(sample):
+            phase = sample.get('phase') or 'unknown'
+            return phases.setdefault(phase, {'count': 0, 'cpu': 0.0, 'memory': 0.0, 'gpu': 0.0, 'gpu_count': 0})
+
+        for sample in samples:
+            bucket = bucket_for(sample)
+            bucket['count'] += 1
+            bucket['cpu'] += sample.get('cpu_percent', 0)
+            bucket['memory'] += sample.get('memory_percent', 0)
+        for sample in gpu_samples:
+            bucket = bucket_for(sample)
+            bucket['gpu'] += sample['gpu_utilization']
+            bucket['gpu_count'] += 1
+
+        summary = {}
+        for phase, bucket in phases.items():
+            summary[phase] = {
+                'samples': bucket['count'],
+                'gpu_samples': bucket['gpu_count'],
+                'cpu_percent': bucket['cpu'] / bucket['count'] if bucket['count'] else None,
+                'memory_percent': bucket['memory'] / bucket['count'] if bucket['count'] else None,
+                'gpu_utilization': bucket['gpu'] / bucket['gpu_count'] if bucket['gpu_count'] else None
+            }
+        return summary
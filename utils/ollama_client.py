@@ -5,29 +5,110 @@ import os
 import logging
 import subprocess
 import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from urllib.parse import urlparse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MODEL_OPERATIONS = ('stop', 'unload', 'preload', 'pull', 'delete')
+
 class OllamaClient:
-    def __init__(self):
-        self.base_url = self._get_server_url()
+    def __init__(self, base_url=None):
+        self.base_url = base_url or self._get_server_url()
         self.max_retries = 3
         self.retry_delay = 1  # seconds
         self.timeout = 10  # seconds
         self.connection_status = None
-        self._check_and_set_connection()
+        self.status_ttl = 10  # seconds before the cached status is re-probed
+        self._status_checked_at = None
+        self._probe_lock = threading.Lock()
+        self._probe_thread = None
+        self._status_generation = 0  # bumped on refresh, so older probes are discarded
+        self.metadata_cache_path = self._get_metadata_cache_path()
+        self.metadata_workers = 4
+        self._metadata_cache = None  # {"metadata": digest -> metadata, "servers": url -> digests}, loaded lazily
+        self._metadata_lock = threading.Lock()
+        self._metadata_inflight = {}  # digest -> Future of a running /api/show fetch
 
     def _get_server_url(self):
         """Get server URL from environment or default"""
         return os.environ.get('OLLAMA_SERVER_URL', 'http://localhost:11434')
 
-    def _check_and_set_connection(self):
-        """Check connection and set status"""
-        self.connection_status = self.check_connection()
+    def _get_metadata_cache_path(self):
+        """Get metadata cache file from environment or default"""
+        return os.environ.get(
+            'OLLAMA_MANAGER_METADATA_CACHE',
+            os.path.join(os.path.expanduser('~'), '.cache', 'ollama-manager', 'model_metadata.json')
+        )
+
+    def _check_and_set_connection(self, generation=None):
+        """Check connection and set status, unless a refresh superseded this check"""
+        with self._probe_lock:
+            if generation is None:
+                generation = self._status_generation
+            base_url = self.base_url
+        status = self.check_connection()
+        with self._probe_lock:
+            # A probe of a previous URL must not overwrite the current status
+            if generation == self._status_generation and base_url == self.base_url:
+                self.connection_status = status
+                self._status_checked_at = time.monotonic()
+        return status
+
+    def refresh_connection_status(self):
+        """Synchronously re-check the connection, e.g. after a URL change"""
+        with self._probe_lock:
+            self._status_generation += 1
+            generation = self._status_generation
+        return self._check_and_set_connection(generation)
+
+    def _background_check(self, generation):
+        try:
+            self._check_and_set_connection(generation)
+        except Exception as e:
+            logger.error(f"Background connection check failed: {str(e)}")
+
+    def start_background_check(self):
+        """Probe the server in a background thread.
+
+        Until the first probe completes the status is reported as 'checking'.
+        """
+        with self._probe_lock:
+            if self._probe_thread is not None and self._probe_thread.is_alive():
+                return
+            if self.connection_status is None:
+                self.connection_status = {"status": "checking", "server": self.base_url}
+            self._probe_thread = threading.Thread(target=self._background_check,
+                                                  args=(self._status_generation,))
+            self._probe_thread.daemon = True
+            self._probe_thread.start()
+
+    def invalidate_connection_status(self):
+        """Mark the cached status stale so the next read triggers a re-probe"""
+        self._status_checked_at = None
+
+    def get_connection_status(self):
+        """Get the cached connection status.
+
+        Checks synchronously only if no status is known yet; a stale status is
+        returned as-is while a background probe refreshes it.
+        """
+        if self.connection_status is None:
+            return self._check_and_set_connection()
+        if self._status_checked_at is None or time.monotonic() - self._status_checked_at > self.status_ttl:
+            self.start_background_check()
         return self.connection_status
 
+    def get_server_version(self):
+        """Get the Ollama server version from the connection status"""
+        version = self.get_connection_status().get("version") or ""
+        try:
+            return json.loads(version).get("version", version)
+        except (ValueError, AttributeError):
+            return version
+
     def create_error_response(self, message, code, details=None):
         """Create a standardized error response"""
         error_obj = {
@@ -161,7 +242,9 @@ class OllamaClient:
         
         try:
             # First try API endpoint
-            status = self._check_and_set_connection()
+            status = self.get_connection_status()
+            if status["status"] == "checking":
+                return {"status": "checking", "models": []}
             if status["status"] == "connected":
                 try:
                     response = requests.get(f"{self.base_url}/api/tags",
@@ -183,6 +266,7 @@ class OllamaClient:
                     
                 except requests.exceptions.RequestException as e:
                     logger.warning(f"API request failed: {str(e)}, falling back to command")
+                    self.invalidate_connection_status()
             
             # Fallback to command line
             cmd = ['ollama', 'ls']
@@ -249,13 +333,17 @@ class OllamaClient:
         
         try:
             # First try API endpoint
-            status = self._check_and_set_connection()
+            status = self.get_connection_status()
+            if status["status"] == "checking":
+                return {"status": "checking", "models": []}
             if status["status"] == "connected":
                 try:
                     response = requests.get(f"{self.base_url}/api/tags",
                                        timeout=self.timeout)
                     response.raise_for_status()
                     models_data = response.json()
+                    if isinstance(models_data, dict):
+                        models_data = models_data.get("models", [])
                     
                     models = []
                     for model in models_data:
@@ -263,6 +351,7 @@ class OllamaClient:
                             models.append({
                                 "name": model.get("name", "unknown"),
                                 "size": model.get("size", 0),
+                                "digest": model.get("digest", ""),
                                 "modified_at": model.get("modified_at", "")
                             })
                     
@@ -271,6 +360,7 @@ class OllamaClient:
                     
                 except requests.exceptions.RequestException as e:
                     logger.warning(f"API request failed: {str(e)}, falling back to command")
+                    self.invalidate_connection_status()
             
             # Fallback to command line
             cmd = ['ollama', 'list']
@@ -326,6 +416,264 @@ class OllamaClient:
                 str(e)
             )
 
+    def list_loaded_models(self):
+        """List models resident in memory as reported by /api/ps"""
+        try:
+            response = requests.get(f"{self.base_url}/api/ps",
+                                    timeout=self.timeout)
+            response.raise_for_status()
+            models = response.json().get("models") or []
+            return {"models": [model for model in models if isinstance(model, dict)]}
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Failed to list loaded models: {str(e)}")
+            return self.create_error_response(
+                "Impossible de récupérer les modèles chargés",
+                "PS_ERROR",
+                str(e)
+            )
+
+    def ping(self, base_url=None):
+        """Quick reachability check of a server's API"""
+        try:
+            response = requests.get(f"{base_url or self.base_url}/api/version", timeout=2)
+            response.raise_for_status()
+            return True
+        except requests.exceptions.RequestException:
+            return False
+
+    def model_operation(self, operation, model_name, base_url=None, keep_alive=None):
+        """Run a single model operation against a server, without health check.
+
+        Used by bulk operations, which check each server once up front.
+        Raises requests exceptions on transport errors.
+        """
+        base_url = base_url or self.base_url
+        # Ollama has no /api/stop: `ollama stop` is a generate with keep_alive 0
+        if operation in ('stop', 'unload'):
+            method, path, payload, timeout = 'POST', '/api/generate', {"model": model_name, "keep_alive": 0}, self.timeout
+        elif operation == 'preload':
+            payload = {"model": model_name}
+            if keep_alive is not None:
+                payload["keep_alive"] = keep_alive
+            # Loading a large model can take a while
+            method, path, timeout = 'POST', '/api/generate', (self.timeout, None)
+        elif operation == 'pull':
+            method, path, payload, timeout = 'POST', '/api/pull', {"model": model_name, "stream": False}, (self.timeout, None)
+        elif operation == 'delete':
+            method, path, payload, timeout = 'DELETE', '/api/delete', {"model": model_name}, self.timeout
+        else:
+            return self.create_error_response(
+                f"Opération inconnue: {operation}",
+                "INVALID_OPERATION"
+            )
+
+        response = requests.request(method, f"{base_url}{path}", json=payload, timeout=timeout)
+        if response.status_code != 200:
+            return self.create_error_response(
+                f"Erreur lors de l'opération {operation} sur le modèle {model_name}",
+                "OPERATION_ERROR",
+                response.text
+            )
+        return {
+            "status": "success",
+            "message": f"Opération {operation} réussie pour le modèle {model_name}"
+        }
+
+    def _read_metadata_cache(self):
+        """Read the cache file, accepting the older flat digest -> metadata layout"""
+        try:
+            with open(self.metadata_cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {"metadata": {}, "servers": {}}
+        if not isinstance(cache, dict):
+            return {"metadata": {}, "servers": {}}
+        if isinstance(cache.get("metadata"), dict) and isinstance(cache.get("servers"), dict):
+            return cache
+        return {"metadata": cache, "servers": {}}
+
+    def _load_metadata_cache(self):
+        """Load persisted metadata on first use"""
+        if self._metadata_cache is None:
+            self._metadata_cache = self._read_metadata_cache()
+
+    def _save_metadata_cache(self):
+        """Persist metadata atomically.
+
+        The file is shared by every client (CLI runs, bulk operations on
+        several servers), so it is merged with what is on disk and a digest
+        is only dropped once no known server lists it anymore.
+        """
+        disk = self._read_metadata_cache()
+        servers = {**disk["servers"], **self._metadata_cache["servers"]}
+        referenced = {digest for digests in servers.values() for digest in digests}
+        metadata = {
+            digest: meta
+            for digest, meta in {**disk["metadata"], **self._metadata_cache["metadata"]}.items()
+            if digest in referenced
+        }
+        self._metadata_cache = {"metadata": metadata, "servers": servers}
+        try:
+            os.makedirs(os.path.dirname(self.metadata_cache_path), exist_ok=True)
+            tmp_path = f"{self.metadata_cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._metadata_cache, f)
+            os.replace(tmp_path, self.metadata_cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to persist model metadata cache: {str(e)}")
+
+    def _fetch_model_metadata(self, model_name):
+        """Fetch and condense /api/show for a model"""
+        response = requests.post(f"{self.base_url}/api/show",
+                                 json={"model": model_name},
+                                 timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        details = data.get("details") or {}
+        model_info = data.get("model_info") or {}
+        architecture = model_info.get("general.architecture", details.get("family", ""))
+
+        def arch_value(key):
+            return model_info.get(f"{architecture}.{key}")
+
+        return {
+            "family": details.get("family", ""),
+            "families": details.get("families") or [],
+            "format": details.get("format", ""),
+            "parameter_size": details.get("parameter_size", ""),
+            "parameter_count": model_info.get("general.parameter_count"),
+            "quantization_level": details.get("quantization_level", ""),
+            "architecture": architecture,
+            "context_length": arch_value("context_length"),
+            "embedding_length": arch_value("embedding_length"),
+            "block_count": arch_value("block_count"),
+            "head_count": arch_value("attention.head_count"),
+            "head_count_kv": arch_value("attention.head_count_kv"),
+            "key_length": arch_value("attention.key_length"),
+            "value_length": arch_value("attention.value_length"),
+            "template": data.get("template", ""),
+            "parameters": data.get("parameters", "")
+        }
+
+    def get_models_metadata(self):
+        """List models with their /api/show metadata, cached by digest.
+
+        Only digests not seen before trigger an /api/show call, so a refresh
+        with an unchanged model list costs a single /api/tags request.
+        """
+        try:
+            response = requests.get(f"{self.base_url}/api/tags",
+                                    timeout=self.timeout)
+            response.raise_for_status()
+            models_data = response.json()
+            if isinstance(models_data, dict):
+                models_data = models_data.get("models", [])
+            models = [model for model in models_data if isinstance(model, dict)]
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to list models for metadata: {str(e)}")
+            return self.create_error_response(
+                "Impossible de récupérer les modèles",
+                "CONNECTION_ERROR",
+                str(e)
+            )
+
+        with self._metadata_lock:
+            self._load_metadata_cache()
+            cache = self._metadata_cache["metadata"]
+            missing = {}  # digests this call fetches
+            pending = {}  # digests another caller is already fetching
+            for model in models:
+                digest = model.get("digest")
+                if not digest or digest in cache or digest in missing:
+                    continue
+                if digest in self._metadata_inflight:
+                    pending[digest] = self._metadata_inflight[digest]
+                else:
+                    missing[digest] = model.get("name") or model.get("model")
+                    self._metadata_inflight[digest] = Future()
+
+        # /api/show calls run without the lock so other listings are not blocked
+        fetched = {}
+        errors = {}
+        if missing:
+            logger.info(f"Fetching metadata for {len(missing)} new model digests")
+            outcomes = {}
+            try:
+                with ThreadPoolExecutor(max_workers=self.metadata_workers) as executor:
+                    futures = {
+                        digest: executor.submit(self._fetch_model_metadata, name)
+                        for digest, name in missing.items()
+                    }
+                    for digest, future in futures.items():
+                        try:
+                            fetched[digest] = outcomes[digest] = future.result()
+                        except (requests.exceptions.RequestException, ValueError) as e:
+                            logger.warning(f"Failed to fetch metadata for {missing[digest]}: {str(e)}")
+                            errors[digest] = str(e)
+                            outcomes[digest] = e
+            finally:
+                with self._metadata_lock:
+                    self._load_metadata_cache()
+                    self._metadata_cache["metadata"].update(fetched)
+                    inflight = [self._metadata_inflight.pop(digest) for digest in missing]
+                for digest, future in zip(missing, inflight):
+                    outcome = outcomes.get(digest, RuntimeError("metadata fetch aborted"))
+                    if isinstance(outcome, Exception):
+                        future.set_exception(outcome)
+                    else:
+                        future.set_result(outcome)
+
+        # Wait for fetches started by concurrent callers instead of repeating them
+        for digest, future in pending.items():
+            try:
+                fetched[digest] = future.result()
+            except Exception as e:
+                errors[digest] = str(e)
+
+        with self._metadata_lock:
+            self._load_metadata_cache()
+            # Digests are tracked per server: a model removed here may still
+            # be installed on another server sharing the cache file
+            listed = sorted({model.get("digest") for model in models if model.get("digest")})
+            servers = self._metadata_cache["servers"]
+            server_changed = servers.get(self.base_url) != listed
+            servers[self.base_url] = listed
+            cache = self._metadata_cache["metadata"]
+            cache.update(fetched)
+
+            if fetched or server_changed:
+                self._save_metadata_cache()
+                cache = self._metadata_cache["metadata"]
+
+            result = []
+            for model in models:
+                digest = model.get("digest", "")
+                entry = {
+                    "name": model.get("name", "unknown"),
+                    "size": model.get("size", 0),
+                    "digest": digest,
+                    "modified_at": model.get("modified_at", ""),
+                    "metadata": cache.get(digest)
+                }
+                if digest in errors:
+                    entry["metadata_error"] = errors[digest]
+                result.append(entry)
+
+        return {"models": result}
+
+    def get_model_metadata(self, model_name):
+        """Get cached metadata for a single model by name"""
+        result = self.get_models_metadata()
+        if "error" in result:
+            return result
+        for model in result["models"]:
+            if model["name"] == model_name or model["name"] == f"{model_name}:latest":
+                return model
+        return self.create_error_response(
+            f"Modèle {model_name} introuvable",
+            "MODEL_NOT_FOUND"
+        )
+
     def stop_model(self, model_name):
         """Stop a running model"""
         if not model_name:
@@ -335,13 +683,14 @@ class OllamaClient:
             )
 
         try:
-            # Try API endpoint first
-            status = self._check_and_set_connection()
-            if status["status"] == "connected":
+            # Try API endpoint first, even while the first probe is pending
+            status = self.get_connection_status()
+            if status["status"] in ("connected", "checking"):
                 try:
+                    # Same request as `ollama stop`: unload with keep_alive 0
                     response = requests.post(
-                        f"{self.base_url}/api/stop",
-                        json={"name": model_name},
+                        f"{self.base_url}/api/generate",
+                        json={"model": model_name, "keep_alive": 0},
                         timeout=self.timeout
                     )
                     
@@ -358,6 +707,7 @@ class OllamaClient:
                     )
                 except requests.exceptions.RequestException as e:
                     logger.warning(f"API request failed: {str(e)}, falling back to command")
+                    self.invalidate_connection_status()
 
             # Fallback to command line
             cmd = ['ollama', 'stop', model_name]
@@ -0,0 +1,155 @@
+import json
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEYFRAME_INTERVAL = 30  # seconds between full frames
+HEARTBEAT_INTERVAL = 15  # seconds of silence before a heartbeat comment
+
+
+class StatsBroadcaster:
+    """Poll a stats source once per tick and share the result with all clients.
+
+    Polling only runs while at least one client is subscribed, so the cost
+    of the source (e.g. nvidia-smi) no longer grows with the number of
+    dashboards.
+    """
+
+    def __init__(self, source, interval=1.0):
+        self.source = source
+        self.interval = interval
+        self.seq = 0
+        self.latest = None
+        self._subscribers = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def subscribe(self):
+        with self._condition:
+            self._subscribers += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify_all()
+
+    def unsubscribe(self):
+        with self._condition:
+            self._subscribers = max(self._subscribers - 1, 0)
+
+    def _poll(self):
+        try:
+            return self.source()
+        except Exception as e:
+            logger.error(f"Error generating stats: {str(e)}")
+            return {
+                "error": {
+                    "message": "Erreur lors de la génération des statistiques GPU",
+                    "code": "GPU_STATS_ERROR",
+                    "details": str(e)
+                }
+            }
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            with self._condition:
+                while self._subscribers == 0:
+                    self._condition.wait()
+            stats = self._poll()
+            with self._condition:
+                self.latest = stats
+                self.seq += 1
+                self._condition.notify_all()
+            next_tick = max(next_tick + self.interval, time.monotonic())
+            time.sleep(max(next_tick - time.monotonic(), 0))
+
+    def wait(self, after_seq, timeout):
+        """Wait for a sample newer than after_seq; returns (seq, stats)"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.seq > after_seq, timeout=timeout)
+            return self.seq, self.latest
+
+
+class DeltaEncoder:
+    """Turn successive snapshots into keyframes and changed-field deltas"""
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self._state = None
+        self._last_keyframe = None
+
+    def encode(self, stats, now=None):
+        """Return ('keyframe', stats), ('delta', changes) or None when unchanged"""
+        now = time.monotonic() if now is None else now
+        if self._state is None or now - self._last_keyframe >= self.keyframe_interval:
+            self._state = dict(stats)
+            self._last_keyframe = now
+            return 'keyframe', stats
+
+        changes = {key: value for key, value in stats.items() if self._state.get(key) != value}
+        for key in self._state:
+            if key not in stats:
+                changes[key] = None
+        if not changes:
+            return None
+        self._state = dict(stats)
+        return 'delta', changes
+
+
+def format_event(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def stream_stats(broadcaster, mode='delta', interval=None, keyframe_interval=KEYFRAME_INTERVAL,
+                 heartbeat_interval=HEARTBEAT_INTERVAL):
+    """SSE generator for one client.
+
+    ``mode='full'`` sends every sample as an unnamed event (legacy format).
+    ``mode='delta'`` sends 'keyframe' and 'delta' events, skipping unchanged
+    samples and emitting a heartbeat comment after ``heartbeat_interval``
+    seconds of silence. ``interval`` decimates to at most one frame per
+    ``interval`` seconds.
+    """
+    interval = max(interval or broadcaster.interval, broadcaster.interval)
+    encoder = DeltaEncoder(keyframe_interval)
+    seq = 0
+    last_sent = None
+    last_write = time.monotonic()
+
+    broadcaster.subscribe()
+    try:
+        # The client reconnection delay, so dashboards recover quickly
+        yield "retry: 2000\n\n"
+        while True:
+            seq, stats = broadcaster.wait(seq, timeout=heartbeat_interval)
+            now = time.monotonic()
+
+            frame = None
+            # Decimate: allow a little jitter relative to the base tick
+            if stats is not None and (last_sent is None or now - last_sent >= interval - broadcaster.interval / 2):
+                if mode == 'full':
+                    frame = format_event(stats)
+                else:
+                    encoded = encoder.encode(stats, now)
+                    if encoded is not None:
+                        event, data = encoded
+                        frame = format_event(data, event=event, event_id=seq)
+                last_sent = now
+
+            if frame is not None:
+                last_write = now
+                yield frame
+            elif now - last_write >= heartbeat_interval:
+                last_write = now
+                yield ": heartbeat\n\n"
+    finally:
+        broadcaster.unsubscribe()
@@ -0,0 +1,240 @@
+import os
+import json
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY = 'registry.ollama.ai'
+DEFAULT_NAMESPACE = 'library'
+
+
+class StorageAnalyzer:
+    """Analyze a local Ollama models directory (manifests + blobs).
+
+    Builds an index of which tags reference which blobs, so the real disk
+    usage, orphaned blobs and the space freed by deleting each tag can be
+    reported; in-progress downloads are listed apart and never counted as
+    reclaimable. Complete blobs are content-addressed and never modified in
+    place, so the blob listing is only refreshed when the blobs directory
+    mtime changes. In-progress ``-partial`` downloads grow in place and are
+    re-stat'ed on every scan. Manifests are only re-parsed when their own
+    mtime or size changes.
+    """
+
+    def __init__(self, models_dir=None):
+        self.models_dir = models_dir or self._get_models_dir()
+        self._lock = threading.Lock()
+        self._manifests = {}  # path -> {'mtime', 'size', 'name', 'digests'}
+        self._blobs = {}  # digest -> {'size', 'disk_usage', 'partial'}
+        self._blobs_mtime = None
+
+    def _get_models_dir(self):
+        """Get models directory from environment or default"""
+        return os.environ.get('OLLAMA_MODELS', os.path.join(os.path.expanduser('~'), '.ollama', 'models'))
+
+    @staticmethod
+    def _tag_name(relative_path):
+        """Convert a manifest path (registry/namespace/model/tag) to a model name"""
+        parts = relative_path.split(os.sep)
+        if len(parts) < 4:
+            return '/'.join(parts)
+        registry, namespace, model, tag = parts[0], parts[1], '/'.join(parts[2:-1]), parts[-1]
+        name = f"{model}:{tag}"
+        if namespace != DEFAULT_NAMESPACE or registry != DEFAULT_REGISTRY:
+            name = f"{namespace}/{name}"
+        if registry != DEFAULT_REGISTRY:
+            name = f"{registry}/{name}"
+        return name
+
+    @staticmethod
+    def _disk_usage(stat):
+        """Allocated size on disk, falling back to the apparent size"""
+        blocks = getattr(stat, 'st_blocks', None)
+        if blocks is None:
+            return stat.st_size
+        return blocks * 512
+
+    def _parse_manifest(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        digests = {}
+        entries = list(manifest.get('layers') or [])
+        if manifest.get('config'):
+            entries.append(manifest['config'])
+        for entry in entries:
+            digest = entry.get('digest')
+            if digest:
+                digests[digest.replace(':', '-', 1)] = entry.get('size', 0)
+        return digests
+
+    def _refresh_manifests(self):
+        manifests_dir = os.path.join(self.models_dir, 'manifests')
+        seen = set()
+        for root, _dirs, files in os.walk(manifests_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(path)
+                cached = self._manifests.get(path)
+                if cached and cached['mtime'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+                    continue
+                try:
+                    digests = self._parse_manifest(path)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable manifest {path}: {str(e)}")
+                    continue
+                self._manifests[path] = {
+                    'mtime': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'name': self._tag_name(os.path.relpath(path, manifests_dir)),
+                    'digests': digests
+                }
+        for path in set(self._manifests) - seen:
+            del self._manifests[path]
+
+    def _refresh_blobs(self):
+        blobs_dir = os.path.join(self.models_dir, 'blobs')
+        try:
+            dir_mtime = os.stat(blobs_dir).st_mtime_ns
+        except OSError:
+            self._blobs = {}
+            self._blobs_mtime = None
+            return
+        if dir_mtime == self._blobs_mtime:
+            self._refresh_partials(blobs_dir)
+            return
+
+        blobs = {}
+        with os.scandir(blobs_dir) as entries:
+            for entry in entries:
+                if not entry.name.startswith('sha256-') or not entry.is_file(follow_symlinks=False):
+                    continue
+                cached = self._blobs.get(entry.name)
+                if cached is not None and not cached['partial']:
+                    blobs[entry.name] = cached
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                blobs[entry.name] = {
+                    'size': stat.st_size,
+                    'disk_usage': self._disk_usage(stat),
+                    'partial': '-partial' in entry.name
+                }
+        self._blobs = blobs
+        self._blobs_mtime = dir_mtime
+
+    def _refresh_partials(self, blobs_dir):
+        """Re-stat partial downloads, which are written in place"""
+        for name, blob in list(self._blobs.items()):
+            if not blob['partial']:
+                continue
+            try:
+                stat = os.stat(os.path.join(blobs_dir, name))
+            except OSError:
+                del self._blobs[name]
+                continue
+            self._blobs[name] = {
+                'size': stat.st_size,
+                'disk_usage': self._disk_usage(stat),
+                'partial': True
+            }
+
+    def scan(self):
+        """Rescan the models directory, reusing unchanged entries"""
+        with self._lock:
+            self._refresh_manifests()
+            self._refresh_blobs()
+
+    def analyze(self):
+        """Scan and build the storage report"""
+        if not os.path.isdir(self.models_dir):
+            return {"error": {
+                "message": "Répertoire des modèles introuvable",
+                "code": "MODELS_DIR_NOT_FOUND",
+                "details": self.models_dir
+            }}
+
+        self.scan()
+        with self._lock:
+            manifests = list(self._manifests.values())
+            blobs = dict(self._blobs)
+
+        # digest -> tags referencing it
+        layer_index = {}
+        for manifest in manifests:
+            for digest in manifest['digests']:
+                layer_index.setdefault(digest, []).append(manifest['name'])
+
+        tags = []
+        apparent_usage = 0
+        for manifest in sorted(manifests, key=lambda m: m['name']):
+            size = 0
+            reclaimable = 0
+            shared = 0
+            missing = []
+            for digest, declared_size in manifest['digests'].items():
+                blob = blobs.get(digest)
+                if blob is None:
+                    missing.append(digest)
+                    size += declared_size
+                    continue
+                size += blob['size']
+                if len(layer_index[digest]) == 1:
+                    reclaimable += blob['disk_usage']
+                else:
+                    shared += blob['size']
+            apparent_usage += size
+            tags.append({
+                "name": manifest['name'],
+                "size": size,
+                "shared_size": shared,
+                "reclaimable": reclaimable,
+                "layers": len(manifest['digests']),
+                "missing_blobs": missing
+            })
+
+        orphans = []
+        in_progress = []
+        unique_size = 0
+        actual_usage = 0
+        for digest, blob in sorted(blobs.items()):
+            if digest in layer_index:
+                unique_size += blob['size']
+                actual_usage += blob['disk_usage']
+                continue
+            entry = {
+                "digest": digest.replace('-', ':', 1),
+                "size": blob['size'],
+                "disk_usage": blob['disk_usage']
+            }
+            # A pull writes its layers before the manifest: not reclaimable
+            (in_progress if blob['partial'] else orphans).append(entry)
+        orphaned_usage = sum(orphan['disk_usage'] for orphan in orphans)
+
+        return {
+            "models_dir": self.models_dir,
+            "tags": tags,
+            "shared_layers": {
+                digest.replace('-', ':', 1): names
+                for digest, names in layer_index.items() if len(names) > 1
+            },
+            "orphans": orphans,
+            "in_progress": in_progress,
+            "summary": {
+                "tag_count": len(tags),
+                "blob_count": len(blobs),
+                "apparent_usage": apparent_usage,
+                "unique_size": unique_size,
+                "actual_usage": actual_usage,
+                "dedup_savings": max(apparent_usage - unique_size, 0),
+                "orphaned_usage": orphaned_usage,
+                "in_progress_usage": sum(entry['disk_usage'] for entry in in_progress),
+                "reclaimable_total": orphaned_usage + sum(tag['reclaimable'] for tag in tags)
+            }
+        }
@@ -0,0 +1,281 @@
+import os
+import json
+import re
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 * 1024
+
+# Approximate bits per weight of common GGUF quantizations
+QUANTIZATION_BITS = {
+    'F32': 32.0, 'F16': 16.0, 'BF16': 16.0,
+    'Q8_0': 8.5, 'Q6_K': 6.56,
+    'Q5_K_M': 5.69, 'Q5_K_S': 5.54, 'Q5_1': 6.0, 'Q5_0': 5.5,
+    'Q4_K_M': 4.85, 'Q4_K_S': 4.58, 'Q4_1': 5.0, 'Q4_0': 4.5,
+    'IQ4_NL': 4.5, 'IQ4_XS': 4.25,
+    'Q3_K_L': 4.27, 'Q3_K_M': 3.91, 'Q3_K_S': 3.5,
+    'Q2_K': 3.35,
+}
+DEFAULT_QUANTIZATION_BITS = 4.85
+KV_CACHE_BYTES = 2  # f16 keys and values
+RUNTIME_OVERHEAD = 512 * MIB  # CUDA context, compute graph and scratch buffers
+CONTEXT_STEP = 256
+CALIBRATION_WEIGHT = 0.2  # weight of a new observation in the moving average
+
+
+class VRAMPlanner:
+    """Estimate model memory needs and predict GPU placement before loading.
+
+    Weights are estimated from the model file size (or parameter count and
+    quantization), the KV cache from layer count, KV heads and the requested
+    context. A per-architecture correction factor is learned from the
+    ``size`` reported by /api/ps for fully GPU-resident models.
+    """
+
+    def __init__(self, ollama_client, gpu_monitor):
+        self.ollama_client = ollama_client
+        self.gpu_monitor = gpu_monitor
+        self.calibration_path = self._get_calibration_path()
+        self._calibration = None  # architecture -> {'factor', 'samples'}
+        self._observed = set()  # (digest, size, context) already folded in
+        self._updated = set()  # architectures calibrated since the last save
+        self._lock = threading.Lock()
+
+    def _get_calibration_path(self):
+        """Get calibration file from environment or default"""
+        return os.environ.get(
+            'OLLAMA_MANAGER_VRAM_CALIBRATION',
+            os.path.join(os.path.expanduser('~'), '.cache', 'ollama-manager', 'vram_calibration.json')
+        )
+
+    def _read_calibration(self):
+        try:
+            with open(self.calibration_path, 'r', encoding='utf-8') as f:
+                calibration = json.load(f)
+            return calibration if isinstance(calibration, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _load_calibration(self):
+        if self._calibration is None:
+            self._calibration = self._read_calibration()
+
+    def _save_calibration(self):
+        # Other processes (CLI, another app) may share the file: keep their entries
+        self._calibration = {
+            **self._read_calibration(),
+            **{architecture: self._calibration[architecture] for architecture in self._updated}
+        }
+        self._updated.clear()
+        try:
+            os.makedirs(os.path.dirname(self.calibration_path), exist_ok=True)
+            tmp_path = f"{self.calibration_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._calibration, f)
+            os.replace(tmp_path, self.calibration_path)
+        except OSError as e:
+            logger.warning(f"Failed to persist VRAM calibration: {str(e)}")
+
+    def _calibration_factor(self, architecture):
+        with self._lock:
+            self._load_calibration()
+            entry = self._calibration.get(architecture or 'unknown')
+            return entry['factor'] if entry else 1.0
+
+    @staticmethod
+    def _parse_parameter_size(parameter_size):
+        """Parse sizes like '8.0B' or '270M' into a parameter count"""
+        match = re.match(r'^\s*([\d.]+)\s*([KMBT]?)', parameter_size or '', re.IGNORECASE)
+        if not match:
+            return None
+        scale = {'': 1, 'K': 1e3, 'M': 1e6, 'B': 1e9, 'T': 1e12}[match.group(2).upper()]
+        return float(match.group(1)) * scale
+
+    def estimate(self, model, num_ctx, num_parallel=1):
+        """Estimate memory (bytes) for a model entry from get_models_metadata()"""
+        metadata = model.get('metadata') or {}
+
+        weights = model.get('size') or 0
+        if not weights:
+            parameters = metadata.get('parameter_count') or self._parse_parameter_size(metadata.get('parameter_size'))
+            bits = QUANTIZATION_BITS.get((metadata.get('quantization_level') or '').upper(), DEFAULT_QUANTIZATION_BITS)
+            weights = int((parameters or 0) * bits / 8)
+
+        block_count = metadata.get('block_count') or 0
+        head_count = metadata.get('head_count') or 0
+        head_count_kv = metadata.get('head_count_kv') or head_count
+        embedding_length = metadata.get('embedding_length') or 0
+        head_dim = embedding_length // head_count if head_count else 0
+        key_length = metadata.get('key_length') or head_dim
+        value_length = metadata.get('value_length') or head_dim
+        kv_per_token = block_count * head_count_kv * (key_length + value_length) * KV_CACHE_BYTES
+        kv_cache = kv_per_token * num_ctx * num_parallel
+
+        factor = self._calibration_factor(metadata.get('architecture'))
+        total = int((weights + kv_cache + RUNTIME_OVERHEAD) * factor)
+        return {
+            "weights": weights,
+            "kv_cache": kv_cache,
+            "kv_per_token": kv_per_token,
+            "overhead": RUNTIME_OVERHEAD,
+            "calibration_factor": factor,
+            "total": total,
+            "block_count": block_count
+        }
+
+    def calibrate(self, models_metadata=None, loaded=None):
+        """Update correction factors from models fully resident on GPU"""
+        if loaded is None:
+            loaded = self.ollama_client.list_loaded_models()
+        if "error" in loaded:
+            return loaded
+        if models_metadata is None:
+            models_metadata = self.ollama_client.get_models_metadata()
+            if "error" in models_metadata:
+                return models_metadata
+        by_digest = {model['digest']: model for model in models_metadata.get('models', [])}
+
+        updated = []
+        for running in loaded['models']:
+            size = running.get('size') or 0
+            num_ctx = running.get('context_length')
+            model = by_digest.get(running.get('digest'))
+            # Only full GPU placements with a known context are comparable
+            if not size or running.get('size_vram') != size or not num_ctx or not model:
+                continue
+            observation = (running.get('digest'), size, num_ctx)
+            if observation in self._observed:
+                continue
+            self._observed.add(observation)
+            estimate = self.estimate(model, num_ctx)
+            raw = estimate['total'] / estimate['calibration_factor']
+            if raw <= 0:
+                continue
+            ratio = size / raw
+            architecture = (model.get('metadata') or {}).get('architecture') or 'unknown'
+            with self._lock:
+                self._load_calibration()
+                entry = self._calibration.get(architecture)
+                if entry is None:
+                    entry = {'factor': ratio, 'samples': 0}
+                else:
+                    entry['factor'] += CALIBRATION_WEIGHT * (ratio - entry['factor'])
+                entry['samples'] += 1
+                self._calibration[architecture] = entry
+                self._updated.add(architecture)
+            updated.append({"model": running.get('name'), "architecture": architecture, "ratio": ratio})
+
+        if updated:
+            with self._lock:
+                self._save_calibration()
+        return {"calibrated": updated}
+
+    @staticmethod
+    def _resident_vram(model, loaded):
+        """VRAM held by the model itself when /api/ps reports it loaded"""
+        if not loaded or "error" in loaded:
+            return 0
+        for running in loaded.get('models', []):
+            if running.get('digest') == model['digest'] or running.get('name') == model['name']:
+                return running.get('size_vram') or 0
+        return 0
+
+    @staticmethod
+    def _reclaim(gpus, resident_vram):
+        """Count the resident model's own VRAM as free again.
+
+        nvidia-smi memory_free already excludes it, but reloading the model
+        with new options replaces that allocation. /api/ps does not say which
+        GPU holds it, so it is credited to the GPUs using the most memory.
+        """
+        remaining = resident_vram
+        for gpu in sorted(gpus, key=lambda g: g['memory_total'] - g['memory_free'], reverse=True):
+            if remaining <= 0:
+                break
+            reclaimed = min(remaining, gpu['memory_total'] - gpu['memory_free'])
+            gpu['memory_free'] += reclaimed
+            remaining -= reclaimed
+
+    def _max_context(self, estimate, budget, num_parallel, context_limit):
+        """Largest context (multiple of CONTEXT_STEP) whose estimate fits in budget"""
+        if not estimate['kv_per_token']:
+            return None
+        factor = estimate['calibration_factor']
+        available = budget / factor - estimate['weights'] - estimate['overhead']
+        if available <= 0:
+            return 0
+        num_ctx = int(available // (estimate['kv_per_token'] * num_parallel))
+        num_ctx -= num_ctx % CONTEXT_STEP
+        if context_limit:
+            num_ctx = min(num_ctx, context_limit)
+        return num_ctx
+
+    def plan(self, model_name, num_ctx=2048, num_parallel=1):
+        """Predict whether a model fits on GPU for the requested context"""
+        models_metadata = self.ollama_client.get_models_metadata()
+        if "error" in models_metadata:
+            return models_metadata
+        model = next((m for m in models_metadata['models']
+                      if m['name'] == model_name or m['name'] == f"{model_name}:latest"), None)
+        if model is None:
+            return self.ollama_client.create_error_response(
+                f"Modèle {model_name} introuvable",
+                "MODEL_NOT_FOUND"
+            )
+
+        loaded = self.ollama_client.list_loaded_models()
+        calibration = self.calibrate(models_metadata, loaded)
+        if "error" in calibration:
+            logger.debug(f"VRAM calibration skipped: {calibration['error']}")
+
+        estimate = self.estimate(model, num_ctx, num_parallel)
+        gpu_info = self.gpu_monitor.get_gpus()
+        gpus = [{
+            "index": gpu['index'],
+            "name": gpu['name'],
+            "memory_free": int(gpu['memory_free'] * MIB),
+            "memory_total": int(gpu['memory_total'] * MIB)
+        } for gpu in gpu_info.get('gpus', [])]
+        resident_vram = self._resident_vram(model, loaded)
+        self._reclaim(gpus, resident_vram)
+        free_total = sum(gpu['memory_free'] for gpu in gpus)
+        free_max = max((gpu['memory_free'] for gpu in gpus), default=0)
+        context_limit = (model.get('metadata') or {}).get('context_length')
+
+        if not gpus:
+            placement = "cpu"
+            gpu_layers = 0
+        elif estimate['total'] <= free_max:
+            placement = "gpu"
+            gpu_layers = estimate['block_count']
+        elif estimate['total'] <= free_total:
+            placement = "gpu_split"
+            gpu_layers = estimate['block_count']
+        else:
+            placement = "partial_offload"
+            gpu_layers = 0
+            block_count = estimate['block_count']
+            if block_count:
+                factor = estimate['calibration_factor']
+                per_layer = (estimate['weights'] + estimate['kv_cache']) / block_count
+                available = free_total / factor - estimate['overhead']
+                gpu_layers = max(0, min(block_count, int(available // per_layer)))
+
+        return {
+            "model": model['name'],
+            "num_ctx": num_ctx,
+            "num_parallel": num_parallel,
+            "estimate": estimate,
+            "gpu_status": gpu_info.get('status'),
+            "gpus": gpus,
+            "free_vram": free_total,
+            "resident_vram": resident_vram,
+            "placement": placement,
+            "fits": placement in ("gpu", "gpu_split"),
+            "gpu_layers": gpu_layers,
+            "max_context_single_gpu": self._max_context(estimate, free_max, num_parallel, context_limit) if gpus else None,
+            "max_context": self._max_context(estimate, free_total, num_parallel, context_limit) if gpus else None,
+            "context_limit": context_limit
+        }